@@ -7,10 +7,44 @@ For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
+import atexit
 import os
 
+from asgiref.sync import sync_to_async
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from varyfly.helpers import open_client, close_client  # noqa: E402
+from varyfly.pricehistory import flush_prices, save_pending_prices  # noqa: E402
+from varyfly.postgresql import close_pools  # noqa: E402
+from varyfly.suggest import get_city_index  # noqa: E402
+
+# Daphne sends no lifespan events, so buffered prices are also saved and the
+# pool closed when the process exits. Handlers run in reverse order.
+atexit.register(close_pools)
+atexit.register(save_pending_prices)
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            open_client()
+            await get_city_index()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_client()
+            await flush_prices()
+            await sync_to_async(close_pools)()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -52,9 +52,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "varyfly.metrics.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "varyfly.metrics.SessionTimingMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -62,11 +63,13 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+
 ROOT_URLCONF = "server.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "varyfly.metrics.TimedDjangoTemplates",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -87,6 +90,30 @@ WSGI_APPLICATION = "server.wsgi.application"
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 DATABASES = {"default": dj_database_url.config(conn_max_age=600)}
+if DATABASES["default"].get("ENGINE") == "django.db.backends.postgresql":
+    # Borrow every connection from a bounded pool and hand it back at the end
+    # of each request instead of keeping one open per request thread.
+    DATABASES["default"]["ENGINE"] = "varyfly.postgresql"
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+DATABASE_POOL_MIN_SIZE = int(os.environ.get("DATABASE_POOL_MIN_SIZE", 1))
+DATABASE_POOL_MAX_SIZE = int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10))
+DATABASE_POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT", 5))
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "varyfly_cache",
+    }
+}
+
+if os.environ.get("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("REDIS_URL"),
+    }
 
 
 # Password validation
@@ -147,3 +174,106 @@ LOGGING = {
         "level": "INFO",
     },
 }
+
+AMADEUS_TOKEN_REFRESH_MARGIN = int(os.environ.get("AMADEUS_TOKEN_REFRESH_MARGIN", 300))
+AMADEUS_TOKEN_EXPIRY_MARGIN = int(os.environ.get("AMADEUS_TOKEN_EXPIRY_MARGIN", 30))
+
+AMADEUS_MAX_CONNECTIONS = int(os.environ.get("AMADEUS_MAX_CONNECTIONS", 100))
+AMADEUS_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("AMADEUS_MAX_KEEPALIVE_CONNECTIONS", 20)
+)
+AMADEUS_KEEPALIVE_EXPIRY = float(os.environ.get("AMADEUS_KEEPALIVE_EXPIRY", 30))
+AMADEUS_TIMEOUT = float(os.environ.get("AMADEUS_TIMEOUT", 5))
+AMADEUS_HTTP2 = bool(os.environ.get("AMADEUS_HTTP2") == "True")
+AMADEUS_TRANSPORT = os.environ.get("AMADEUS_TRANSPORT")
+AMADEUS_PAGE_CONCURRENCY = int(os.environ.get("AMADEUS_PAGE_CONCURRENCY", 4))
+AMADEUS_MAX_CONCURRENCY = int(os.environ.get("AMADEUS_MAX_CONCURRENCY", 20))
+AMADEUS_RATE_LIMITS = {
+    "default": {"rate": float(os.environ.get("AMADEUS_RATE_LIMIT", 10)), "burst": 10},
+    "/v2/shopping/flight-offers": {"rate": 10, "burst": 1},
+}
+AMADEUS_MAX_RETRIES = int(os.environ.get("AMADEUS_MAX_RETRIES", 3))
+AMADEUS_RETRY_BASE_DELAY = float(os.environ.get("AMADEUS_RETRY_BASE_DELAY", 0.5))
+AMADEUS_RETRY_MAX_DELAY = float(os.environ.get("AMADEUS_RETRY_MAX_DELAY", 30))
+
+VIEW_DEADLINES = {
+    "busiest_travel_periods": 10,
+    "cheapest_everywhere": 45,
+    "cheapest_flight_dates": 20,
+    "destinations": 15,
+    "destinations_country": 15,
+    "flight_search": 25,
+    "home": 10,
+    "price_calendar": 30,
+    "quietest_month": 30,
+    "safety": 15,
+}
+
+# Shopping searches can legitimately take as long as the slowest page allows;
+# callers are still cut off at their own deadline.
+AMADEUS_SHOPPING_TIMEOUT = float(
+    os.environ.get("AMADEUS_SHOPPING_TIMEOUT", max(VIEW_DEADLINES.values()))
+)
+AMADEUS_TIMEOUTS = {
+    "/v1/shopping/flight-dates": AMADEUS_SHOPPING_TIMEOUT,
+    "/v2/shopping/flight-offers": AMADEUS_SHOPPING_TIMEOUT,
+}
+
+PAGE_ETAG_VERSION = os.environ.get("RENDER_GIT_COMMIT", "")
+PAGE_CACHE_CONTROL = {
+    "busiest_travel_periods": {
+        "cache_control": {"public": True, "max_age": 24 * 60 * 60}
+    },
+    "destinations": {
+        "cache_control": {"private": True, "no_cache": True},
+        "vary": ["Cookie"],
+    },
+    "safety": {"cache_control": {"public": True, "no_cache": True}},
+}
+
+AMADEUS_CACHE_MAX_ENTRIES = int(os.environ.get("AMADEUS_CACHE_MAX_ENTRIES", 1024))
+AMADEUS_CACHE_TTLS = {
+    "city_details": 7 * 24 * 60 * 60,
+    "city_airports": 7 * 24 * 60 * 60,
+    "city_geocode": 7 * 24 * 60 * 60,
+    "direct_destinations": 24 * 60 * 60,
+    "busiest_period": 365 * 24 * 60 * 60,
+    "safety_rated_locations": 24 * 60 * 60,
+    "flight_offers": 15 * 60,
+    "price_calendar": 60 * 60,
+}
+AMADEUS_CACHE_STALE_TTLS = {
+    "city_details": 30 * 24 * 60 * 60,
+    "direct_destinations": 7 * 24 * 60 * 60,
+    "busiest_period": 30 * 24 * 60 * 60,
+    "safety_rated_locations": 7 * 24 * 60 * 60,
+}
+
+CITY_SUGGESTION_LIMIT = int(os.environ.get("CITY_SUGGESTION_LIMIT", 10))
+
+ROUTE_GRAPH_TTL = int(os.environ.get("ROUTE_GRAPH_TTL", 15 * 60))
+ROUTE_FETCH_CONCURRENCY = int(os.environ.get("ROUTE_FETCH_CONCURRENCY", 8))
+DESTINATIONS_FRAGMENT_TTL = int(os.environ.get("DESTINATIONS_FRAGMENT_TTL", 15 * 60))
+
+CHEAPEST_EVERYWHERE_CONCURRENCY = int(
+    os.environ.get("CHEAPEST_EVERYWHERE_CONCURRENCY", 5)
+)
+CHEAPEST_EVERYWHERE_TIMEOUT = float(os.environ.get("CHEAPEST_EVERYWHERE_TIMEOUT", 20))
+
+PRICE_CALENDAR_CONCURRENCY = int(os.environ.get("PRICE_CALENDAR_CONCURRENCY", 4))
+
+FLIGHT_PRICE_OBSERVATION_INTERVAL = int(
+    os.environ.get("FLIGHT_PRICE_OBSERVATION_INTERVAL", 60 * 60)
+)
+FLIGHT_PRICE_BATCH_SIZE = int(os.environ.get("FLIGHT_PRICE_BATCH_SIZE", 500))
+FLIGHT_PRICE_FLUSH_INTERVAL = float(os.environ.get("FLIGHT_PRICE_FLUSH_INTERVAL", 5))
+PRICE_TREND_MAX_POINTS = int(os.environ.get("PRICE_TREND_MAX_POINTS", 60))
+
+BUSIEST_PERIOD_MAX_YEARS = int(os.environ.get("BUSIEST_PERIOD_MAX_YEARS", 5))
+TRAFFIC_SCORES_CONCURRENCY = int(os.environ.get("TRAFFIC_SCORES_CONCURRENCY", 5))
+TRAFFIC_SCORES_TTL = 365 * 24 * 60 * 60
+TRAFFIC_SCORES_MISSING_TTL = int(
+    os.environ.get("TRAFFIC_SCORES_MISSING_TTL", 24 * 60 * 60)
+)
+
+SAFETY_AREAS_PER_CHUNK = int(os.environ.get("SAFETY_AREAS_PER_CHUNK", 50))
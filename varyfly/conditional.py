@@ -0,0 +1,49 @@
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(settings.PAGE_ETAG_VERSION.encode())
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+    return quote_etag(digest.hexdigest())
+
+
+def not_modified(request, etag=None, last_modified=None):
+    if etag is None and last_modified is None:
+        return None
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def add_page_headers(response, page, etag=None, last_modified=None):
+    if etag is not None:
+        response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    page_headers = settings.PAGE_CACHE_CONTROL[page]
+    if etag is None and last_modified is None:
+        patch_cache_control(response, no_cache=True)
+    else:
+        patch_cache_control(response, **page_headers.get("cache_control", {}))
+    if page_headers.get("vary"):
+        patch_vary_headers(response, page_headers["vary"])
+    return response
+
+
+def conditional_response(request, page, etag=None, last_modified=None):
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        add_page_headers(response, page, etag, last_modified)
+    return response
@@ -0,0 +1,69 @@
+import asyncio
+import functools
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_current_deadline = ContextVar("deadline", default=None)
+
+
+class Deadline:
+    def __init__(self, budget):
+        self.expires_at = time.monotonic() + budget
+        self.partial = False
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append(_current_deadline.set(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_deadline.reset(self._tokens.pop())
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0)
+
+    async def stream(self, content):
+        with self:
+            async for chunk in content:
+                yield chunk
+
+
+def with_deadline(view_name):
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            with Deadline(settings.VIEW_DEADLINES[view_name]):
+                return await view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+def clear_deadline():
+    _current_deadline.set(None)
+
+
+def remaining_time():
+    deadline = _current_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def mark_partial():
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.partial = True
+
+
+async def within_deadline(awaitable):
+    try:
+        return await asyncio.wait_for(awaitable, remaining_time())
+    except asyncio.TimeoutError:
+        mark_partial()
+        raise
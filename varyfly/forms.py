@@ -1,4 +1,7 @@
+import calendar
+
 from django import forms
+from django.conf import settings
 
 
 class HomeSearchForm(forms.Form):
@@ -27,6 +30,14 @@ class TravelPreferencesForm(forms.Form):
         self.label_suffix = ""  # Removes : as label suffix
 
 
+class PriceCalendarForm(forms.Form):
+    nonstop_only = forms.BooleanField(required=False, label="Direct flights only")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.label_suffix = ""  # Removes : as label suffix
+
+
 class HomeResultsForm(forms.Form):
     city = forms.ChoiceField(widget=forms.RadioSelect, choices=())
 
@@ -35,3 +46,58 @@ class HomeResultsForm(forms.Form):
         self.fields["city"].choices = choices
         if label is not None:
             self.fields["city"].label = label
+
+
+class FlightOffersFilterForm(forms.Form):
+    sort = forms.ChoiceField(
+        required=False,
+        label="Sort by: ",
+        choices=[("price", "Price"), ("duration", "Duration"), ("stops", "Stops")],
+    )
+    max_stops = forms.TypedChoiceField(
+        required=False,
+        label="Stops: ",
+        coerce=int,
+        empty_value=None,
+        choices=[
+            ("", "Any"),
+            (0, "Direct only"),
+            (1, "Up to 1 stop"),
+            (2, "Up to 2 stops"),
+        ],
+    )
+    max_price = forms.FloatField(required=False, min_value=0, label="Max price: ")
+    max_duration_hours = forms.IntegerField(
+        required=False, min_value=1, label="Max hours per journey: "
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.label_suffix = ""  # Removes : as label suffix
+
+
+class TrafficYearsForm(forms.Form):
+    years = forms.TypedChoiceField(
+        required=False,
+        label="Compare: ",
+        coerce=int,
+        empty_value=1,
+        choices=[
+            (years, f"{years} {'years' if years > 1 else 'year'}")
+            for years in range(1, settings.BUSIEST_PERIOD_MAX_YEARS + 1)
+        ],
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.label_suffix = ""  # Removes : as label suffix
+
+
+class QuietestMonthForm(TrafficYearsForm):
+    month = forms.TypedChoiceField(
+        required=False,
+        label="Month: ",
+        coerce=int,
+        empty_value=None,
+        choices=[(month, name) for month, name in enumerate(calendar.month_name[1:])],
+    )
@@ -1,37 +1,156 @@
+import asyncio
+import copy
+import functools
+import hashlib
 import logging
 import os
+import time
+from collections import OrderedDict
 from datetime import datetime
 
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.module_loading import import_string
 
-def get_home_city(request):
-    return request.session.get("home_city", {})
+from varyfly.deadline import (
+    clear_deadline,
+    mark_partial,
+    remaining_time,
+    within_deadline,
+)
+from varyfly.metrics import observe_upstream, timed, timing
+from varyfly.models import Location, TravelProfile, normalize_location_name
+from varyfly.offers import parse_flight_offers
+from varyfly.pricehistory import record_flight_dates
+from varyfly.profiles import (
+    load_user_profile,
+    save_profile,
+    session_user_id,
+    session_visitor_id,
+)
+from varyfly.ratelimit import get_rate_limiter, retry_delay
 
 
-def get_travel_preferences(request):
-    return request.session.get("travel_preferences", {})
+@timed("session")
+def update_session(request, key, value):
+    if request.session.get(key) == value:
+        return False
+    request.session[key] = value
+    return True
 
 
-def save_travel_preferences(request, travel_preferences):
-    request.session["travel_preferences"] = travel_preferences
+async def get_profile_value(request, key):
+    with timing("session"):
+        user_id = session_user_id(request)
+    if key not in request.session and user_id:
+        profile = await load_user_profile(user_id) or {}
+        for field in TravelProfile.FIELDS:
+            update_session(request, field, profile.get(field, {}))
+    with timing("session"):
+        return request.session.get(key, {})
 
 
-async def get_destination_cities_for_airport(
-    client, token_type, access_token, airport_iata
-):
-    response = await client.get(
-        f"https://{os.environ.get('AMADEUS_BASE_URL')}/v1/airport/direct-destinations",
-        params={
-            "departureAirportCode": airport_iata,
-        },
-        headers={"Authorization": f"{token_type} {access_token}"},
+async def save_profile_value(request, key, value):
+    if update_session(request, key, value):
+        await save_profile(
+            session_visitor_id(request), session_user_id(request), **{key: value}
+        )
+
+
+async def get_home_city(request):
+    return await get_profile_value(request, "home_city")
+
+
+async def save_home_city(request, home_city):
+    await save_profile_value(request, "home_city", home_city)
+
+
+async def get_travel_preferences(request):
+    return await get_profile_value(request, "travel_preferences")
+
+
+async def save_travel_preferences(request, travel_preferences):
+    await save_profile_value(request, "travel_preferences", travel_preferences)
+
+
+def home_city_choice(city):
+    return (
+        f"{city['address']['cityName']},{city['iataCode']},{city['address']['countryCode']},"
+        f"{city['geoCode']['latitude']},{city['geoCode']['longitude']},"
+        f"{city['address']['countryName']}",
+        f"{city['address']['cityName']}, {city['address']['countryName']}",
     )
-    response.raise_for_status()
-    return response.json().get("data", [])
 
 
-async def access_token_and_type(client):
-    response = await client.post(
-        f"https://{os.environ.get('AMADEUS_BASE_URL')}/v1/security/oauth2/token",
+_client = None
+_client_loop = None
+_response_cache = OrderedDict()
+response_cache_stats = {
+    "hits": 0,
+    "shared_hits": 0,
+    "stale_hits": 0,
+    "misses": 0,
+    "evictions": 0,
+}
+_revalidations = {}
+RESPONSE_CACHE_VERSION = 2
+_access_token = {}
+_access_token_refresh = None
+_in_flight_requests = {}
+coalescing_stats = {"requests": 0, "absorbed": 0}
+
+
+def open_client(transport=None):
+    global _client, _client_loop
+    http2 = settings.AMADEUS_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logging.warning("AMADEUS_HTTP2 is set but h2 is not installed.")
+            http2 = False
+    if transport is None and settings.AMADEUS_TRANSPORT:
+        transport = import_string(settings.AMADEUS_TRANSPORT)()
+    _client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.AMADEUS_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AMADEUS_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.AMADEUS_KEEPALIVE_EXPIRY,
+        ),
+        http2=http2,
+        timeout=settings.AMADEUS_TIMEOUT,
+        transport=transport,
+    )
+    _client_loop = asyncio.get_running_loop()
+    return _client
+
+
+async def close_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def get_client():
+    if _client is None or _client_loop is not asyncio.get_running_loop():
+        return open_client()
+    return _client
+
+
+def amadeus_url(path):
+    base_url = os.environ.get("AMADEUS_BASE_URL")
+    if "://" not in base_url:
+        base_url = f"https://{base_url}"
+    return f"{base_url}{path}"
+
+
+async def request_access_token():
+    response = await get_client().post(
+        amadeus_url("/v1/security/oauth2/token"),
         data={
             "grant_type": "client_credentials",
             "client_id": os.environ.get("AMADEUS_API_KEY"),
@@ -40,53 +159,597 @@ async def access_token_and_type(client):
     )
     response.raise_for_status()
     response = response.json()
-    access_token = response["access_token"]
-    token_type = response["token_type"]
-    return token_type, access_token
+    return {
+        "access_token": response["access_token"],
+        "token_type": response["token_type"],
+        "expires_at": time.monotonic() + int(response.get("expires_in", 0)),
+    }
 
 
-async def get_city_details(
-    city_iata,
-    country_code,
-    client,
-    token_type,
-    access_token,
-):
-    response = await client.get(
-        f"https://{os.environ.get('AMADEUS_BASE_URL')}/v1/reference-data/locations",
+def _access_token_refreshed(future):
+    global _access_token, _access_token_refresh
+    _access_token_refresh = None
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        exc = future.exception()
+        logging.error(f"Failed to refresh Amadeus access token: {exc!r}")
+        return
+    _access_token = future.result()
+
+
+def refresh_access_token():
+    global _access_token_refresh
+    if _access_token_refresh is None:
+        _access_token_refresh = asyncio.ensure_future(request_access_token())
+        _access_token_refresh.add_done_callback(_access_token_refreshed)
+    return _access_token_refresh
+
+
+def invalidate_access_token(access_token):
+    global _access_token
+    if _access_token.get("access_token") == access_token:
+        _access_token = {}
+
+
+async def access_token_and_type():
+    remaining = _access_token.get("expires_at", 0) - time.monotonic()
+    if remaining <= settings.AMADEUS_TOKEN_EXPIRY_MARGIN:
+        token = await asyncio.shield(refresh_access_token())
+        return token["token_type"], token["access_token"]
+    if remaining <= settings.AMADEUS_TOKEN_REFRESH_MARGIN:
+        refresh_access_token()
+    return _access_token["token_type"], _access_token["access_token"]
+
+
+def amadeus_request_key(method, url, params=None):
+    url = httpx.URL(url) if params is None else httpx.URL(url, params=params)
+    return (
+        method,
+        str(url.copy_with(query=None)),
+        tuple(sorted(url.params.multi_items())),
+    )
+
+
+def _amadeus_request_done(key, future):
+    request = _in_flight_requests.pop(key)
+    coalescing_stats["requests"] += 1
+    coalescing_stats["absorbed"] += request["absorbed"]
+    if request["absorbed"]:
+        logging.info(
+            f"{key[0]} {key[1]} absorbed {request['absorbed']} identical requests."
+        )
+    if not future.cancelled():
+        future.exception()
+
+
+async def amadeus_get(url, params=None, **kwargs):
+    key = amadeus_request_key("GET", url, params)
+    if remaining_time() == 0:
+        mark_partial()
+        raise asyncio.TimeoutError
+    request = _in_flight_requests.get(key)
+    if request is None:
+        request = {
+            "future": asyncio.ensure_future(request_amadeus(url, params, **kwargs)),
+            "absorbed": 0,
+            "waiters": 0,
+        }
+        _in_flight_requests[key] = request
+        request["future"].add_done_callback(
+            functools.partial(_amadeus_request_done, key)
+        )
+    else:
+        request["absorbed"] += 1
+    request["waiters"] += 1
+    with timing("upstream"):
+        try:
+            return await within_deadline(asyncio.shield(request["future"]))
+        except httpx.TimeoutException as exc:
+            logging.warning(f"Timed out requesting {url}: {exc!r}")
+            mark_partial()
+            raise asyncio.TimeoutError from exc
+        finally:
+            request["waiters"] -= 1
+            if not request["waiters"]:
+                request["future"].cancel()
+
+
+async def send_amadeus_request(endpoint, url, params, **kwargs):
+    client = get_client()
+    for attempt in range(settings.AMADEUS_MAX_RETRIES + 1):
+        async with get_rate_limiter().limit(endpoint):
+            with timing("token"):
+                token_type, access_token = await access_token_and_type()
+            response = await client.get(
+                url,
+                params=params,
+                headers={"Authorization": f"{token_type} {access_token}"},
+                **kwargs,
+            )
+            if response.status_code == 401:
+                invalidate_access_token(access_token)
+                with timing("token"):
+                    token_type, access_token = await access_token_and_type()
+                response = await client.get(
+                    url,
+                    params=params,
+                    headers={"Authorization": f"{token_type} {access_token}"},
+                    **kwargs,
+                )
+        if response.status_code != 429 or attempt == settings.AMADEUS_MAX_RETRIES:
+            break
+        delay = retry_delay(response, attempt)
+        logging.warning(
+            f"Rate limited by {response.request.url}, retrying in {delay:.2f}s."
+        )
+        await asyncio.sleep(delay)
+    return response, attempt
+
+
+async def request_amadeus(url, params=None, **kwargs):
+    endpoint = httpx.URL(url).path
+    kwargs.setdefault(
+        "timeout", settings.AMADEUS_TIMEOUTS.get(endpoint, settings.AMADEUS_TIMEOUT)
+    )
+    started_at = time.perf_counter()
+    try:
+        response, retries = await send_amadeus_request(endpoint, url, params, **kwargs)
+    except httpx.RequestError:
+        observe_upstream(endpoint, "error", time.perf_counter() - started_at, 0, 0)
+        raise
+    observe_upstream(
+        endpoint,
+        response.status_code,
+        time.perf_counter() - started_at,
+        len(response.content),
+        retries,
+    )
+    response.raise_for_status()
+    return response
+
+
+def _response_cache_key(endpoint, args):
+    digest = hashlib.sha1(repr(args).encode()).hexdigest()
+    return f"amadeus:{endpoint}:{digest}"
+
+
+def _remember_response(key, entry):
+    _response_cache[key] = entry
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > settings.AMADEUS_CACHE_MAX_ENTRIES:
+        _response_cache.popitem(last=False)
+        response_cache_stats["evictions"] += 1
+
+
+async def _store_response(key, endpoint, func, args):
+    value = await func(*args)
+    ttl = settings.AMADEUS_CACHE_TTLS[endpoint]
+    stale_ttl = settings.AMADEUS_CACHE_STALE_TTLS.get(endpoint, 0)
+    now = time.time()
+    entry = (now + ttl, now + ttl + stale_ttl, value)
+    _remember_response(key, entry)
+    await cache.aset(key, entry, ttl + stale_ttl, version=RESPONSE_CACHE_VERSION)
+    return value
+
+
+async def _revalidate_response(key, endpoint, func, args):
+    clear_deadline()
+    await _store_response(key, endpoint, func, args)
+
+
+def _revalidation_done(key, task):
+    if _revalidations.get(key) is task:
+        del _revalidations[key]
+    if not task.cancelled() and task.exception() is not None:
+        logging.warning(f"Background refresh of {key} failed: {task.exception()!r}")
+
+
+def _revalidate(key, endpoint, func, args):
+    task = _revalidations.get(key)
+    if (
+        task is not None
+        and not task.done()
+        and task.get_loop() is asyncio.get_running_loop()
+    ):
+        return
+    task = asyncio.ensure_future(_revalidate_response(key, endpoint, func, args))
+    _revalidations[key] = task
+    task.add_done_callback(functools.partial(_revalidation_done, key))
+
+
+def cached_response(endpoint):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args):
+            key = _response_cache_key(endpoint, args)
+            now = time.time()
+            entry = _response_cache.get(key)
+            if entry is not None and entry[1] > now:
+                _response_cache.move_to_end(key)
+                response_cache_stats["hits"] += 1
+            else:
+                entry = await cache.aget(key, version=RESPONSE_CACHE_VERSION)
+                if entry is not None and entry[1] > now:
+                    _remember_response(key, entry)
+                    response_cache_stats["shared_hits"] += 1
+                else:
+                    response_cache_stats["misses"] += 1
+                    value = await _store_response(key, endpoint, func, args)
+                    return copy.deepcopy(value)
+            if entry[0] <= now:
+                response_cache_stats["stale_hits"] += 1
+                _revalidate(key, endpoint, func, args)
+            return copy.deepcopy(entry[2])
+
+        return wrapper
+
+    return decorator
+
+
+@cached_response("direct_destinations")
+async def get_destination_cities_for_airport(airport_iata):
+    response = await amadeus_get(
+        amadeus_url("/v1/airport/direct-destinations"),
+        params={
+            "departureAirportCode": airport_iata,
+        },
+    )
+    return response.json().get("data", [])
+
+
+async def find_location(sub_type, iata_code, country_code):
+    location = await Location.objects.filter(
+        sub_type=sub_type, iata_code=iata_code, country_code=country_code
+    ).afirst()
+    return location.as_amadeus_location() if location else None
+
+
+async def search_cities(keyword):
+    cities = [
+        city.as_amadeus_location()
+        async for city in Location.objects.filter(
+            Q(normalized_name__startswith=normalize_location_name(keyword))
+            | Q(iata_code=keyword.upper()),
+            sub_type=Location.CITY,
+        ).order_by("normalized_name")[:10]
+    ]
+    if cities:
+        return cities
+    response = await amadeus_get(
+        amadeus_url("/v1/reference-data/locations"),
+        params={
+            "subType": "CITY",
+            "keyword": keyword,
+        },
+    )
+    return response.json().get("data", [])
+
+
+async def get_city_details(city_iata, country_code):
+    city = await find_location(Location.CITY, city_iata, country_code)
+    if city is not None:
+        return city
+    return await request_city_details(city_iata, country_code)
+
+
+@cached_response("city_details")
+async def request_city_details(city_iata, country_code):
+    response = await amadeus_get(
+        amadeus_url("/v1/reference-data/locations"),
         params={
             "keyword": city_iata,
             "countryCode": country_code,
             "subType": "CITY",
         },
-        headers={"Authorization": f"{token_type} {access_token}"},
     )
-    response.raise_for_status()
     city_data = response.json().get("data", [])
     city = next(city for city in city_data if city["iataCode"] == city_iata)
     return city
 
 
-async def add_precise_city_lat_long(
-    city, country_code, client, token_type, access_token
-):
-    full_city_name = city["name"].replace("/", " ").split(" ")
-    city_name = full_city_name[0]
-    for word in full_city_name[1:]:
-        if len(city_name + " " + word) > 10:
-            break
-        city_name += " " + word
-    response = await client.get(
-        f"https://{os.environ.get('AMADEUS_BASE_URL')}/v1/reference-data/locations/cities",
+async def get_city_airports(city_name, city_iata, country_code):
+    airports = [
+        iata_code
+        async for iata_code in Location.objects.filter(
+            sub_type=Location.AIRPORT, city_code=city_iata, country_code=country_code
+        ).values_list("iata_code", flat=True)
+    ]
+    if airports:
+        return airports
+    return await request_city_airports(city_name, city_iata, country_code)
+
+
+@cached_response("city_airports")
+async def request_city_airports(city_name, city_iata, country_code):
+    response = await amadeus_get(
+        amadeus_url("/v1/reference-data/locations"),
+        params={
+            "subType": "AIRPORT",
+            "keyword": city_name,
+            "countryCode": country_code,
+        },
+    )
+    return [
+        airport["iataCode"]
+        for airport in response.json().get("data", [])
+        if airport["address"]["cityCode"] == city_iata
+    ]
+
+
+@cached_response("city_geocode")
+async def get_city_geocode(city_name, country_code):
+    response = await amadeus_get(
+        amadeus_url("/v1/reference-data/locations/cities"),
         params={
             "keyword": city_name,
             "countryCode": country_code,
             "max": 1,
         },
-        headers={"Authorization": f"{token_type} {access_token}"},
     )
-    response.raise_for_status()
     city_data = response.json().get("data")
     if city_data and city_data[0].get("geoCode"):
-        city["geoCode"] = city_data[0]["geoCode"]
+        return city_data[0]["geoCode"]
+    return None
+
+
+async def add_precise_city_lat_long(city, country_code):
+    full_city_name = city["name"].replace("/", " ").split(" ")
+    city_name = full_city_name[0]
+    for word in full_city_name[1:]:
+        if len(city_name + " " + word) > 10:
+            break
+        city_name += " " + word
+    geo_code = await get_city_geocode(city_name, country_code)
+    if geo_code:
+        city["geoCode"] = geo_code
     return city
+
+
+@cached_response("busiest_period")
+async def get_busiest_travel_periods(city_iata, year):
+    response = await amadeus_get(
+        amadeus_url("/v1/travel/analytics/air-traffic/busiest-period"),
+        params={"cityCode": city_iata, "period": year},
+    )
+    return response.json().get("data", [])
+
+
+@cached_response("safety_rated_locations")
+async def get_safety_rated_locations(latitude, longitude):
+    url = amadeus_url("/v1/safety/safety-rated-locations")
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "radius": 20,
+        "page[limit]": 10000,
+    }
+    response = await amadeus_get(url, params=params)
+    response = response.json()
+    areas = response.get("data", [])
+    meta = response.get("meta", {})
+    links = meta.get("links", {})
+    if not links.get("next") or not areas:
+        return areas
+    if "count" not in meta:
+        while links.get("next"):
+            response = await amadeus_get(links["next"])
+            response = response.json()
+            areas.extend(response.get("data", []))
+            links = response.get("meta", {}).get("links", {})
+        return areas
+    page_size = len(areas)
+    semaphore = asyncio.Semaphore(settings.AMADEUS_PAGE_CONCURRENCY)
+
+    async def get_page(offset):
+        async with semaphore:
+            response = await amadeus_get(
+                url, params={**params, "page[limit]": page_size, "page[offset]": offset}
+            )
+            return response.json().get("data", [])
+
+    pages = await asyncio.gather(
+        *(get_page(offset) for offset in range(len(areas), meta["count"], page_size))
+    )
+    for page in pages:
+        areas.extend(page)
+    return areas
+
+
+async def get_flight_dates(
+    origin_iata, destination_iata, nonstop, trip_length, **kwargs
+):
+    params = {
+        "origin": origin_iata,
+        "destination": destination_iata,
+        "nonStop": nonstop,
+    }
+    if trip_length in [f"{i}" for i in range(1, 16)]:
+        params["duration"] = trip_length
+    else:
+        params["oneWay"] = True
+    response = await amadeus_get(
+        amadeus_url("/v1/shopping/flight-dates"),
+        params=params,
+        **kwargs,
+    )
+    response = response.json()
+    record_flight_dates(nonstop, trip_length, response)
+    return response
+
+
+PRICE_CALENDAR_TRIP_LENGTHS = [f"{days}" for days in range(1, 16)] + ["One way"]
+
+
+def merge_price_calendar(responses):
+    currency = ""
+    prices = {}
+    for trip_length, response in zip(PRICE_CALENDAR_TRIP_LENGTHS, responses):
+        currency = currency or response.get("meta", {}).get("currency", "")
+        for flight in response.get("data", []):
+            prices.setdefault(flight["departureDate"], {})[trip_length] = {
+                "price": float(flight["price"]["total"]),
+                "offers_querystring": flight["links"]["flightOffers"].split("?")[1],
+            }
+    cheapest = min(
+        (cell["price"] for cells in prices.values() for cell in cells.values()),
+        default=None,
+    )
+    return {
+        "currency": currency,
+        "rows": [
+            {
+                "readable_departure": datetime.strptime(
+                    departure_date, "%Y-%m-%d"
+                ).strftime("%a %d %b %Y"),
+                "cells": [
+                    {
+                        **prices[departure_date][trip_length],
+                        "cheapest": prices[departure_date][trip_length]["price"]
+                        == cheapest,
+                    }
+                    if trip_length in prices[departure_date]
+                    else None
+                    for trip_length in PRICE_CALENDAR_TRIP_LENGTHS
+                ],
+            }
+            for departure_date in sorted(prices)
+        ],
+    }
+
+
+def price_calendar_key(origin_iata, destination_iata, nonstop):
+    return f"price_calendar:{origin_iata}:{destination_iata}:{bool(nonstop)}"
+
+
+async def get_price_calendar(origin_iata, destination_iata, nonstop):
+    key = price_calendar_key(origin_iata, destination_iata, nonstop)
+    calendar = await cache.aget(key)
+    if calendar is not None:
+        return calendar
+    semaphore = asyncio.Semaphore(settings.PRICE_CALENDAR_CONCURRENCY)
+
+    async def get_trip_length_prices(trip_length):
+        async with semaphore:
+            try:
+                return await get_flight_dates(
+                    origin_iata, destination_iata, nonstop, trip_length
+                )
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code >= 500 or exc.response.status_code == 429:
+                    raise
+                logging.warning(
+                    f"No flight dates for a {trip_length} trip: error response {exc.response.status_code} while requesting {exc.request.url}"
+                )
+                return {}
+
+    tasks = [
+        asyncio.ensure_future(get_trip_length_prices(trip_length))
+        for trip_length in PRICE_CALENDAR_TRIP_LENGTHS
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=remaining_time())
+    finally:
+        for task in tasks:
+            task.cancel()
+    responses = {}
+    for trip_length, task in zip(PRICE_CALENDAR_TRIP_LENGTHS, tasks):
+        if task not in done:
+            continue
+        exc = task.exception()
+        if isinstance(exc, httpx.HTTPStatusError):
+            logging.warning(
+                f"Skipping {trip_length} trips after error response {exc.response.status_code} while requesting {exc.request.url}"
+            )
+        elif isinstance(exc, httpx.RequestError):
+            logging.warning(
+                f"Skipping {trip_length} trips after an error requesting {exc.request.url}."
+            )
+        elif isinstance(exc, asyncio.TimeoutError):
+            pass
+        elif exc is not None:
+            raise exc
+        else:
+            responses[trip_length] = task.result()
+    calendar = merge_price_calendar(
+        [responses.get(trip_length, {}) for trip_length in PRICE_CALENDAR_TRIP_LENGTHS]
+    )
+    if len(responses) == len(PRICE_CALENDAR_TRIP_LENGTHS):
+        await cache.aset(key, calendar, settings.AMADEUS_CACHE_TTLS["price_calendar"])
+    else:
+        mark_partial()
+    return calendar
+
+
+@cached_response("flight_offers")
+async def get_flight_offers(
+    origin_iata, destination_iata, departure_date, return_date, adults, nonstop
+):
+    params = {
+        "originLocationCode": origin_iata,
+        "destinationLocationCode": destination_iata,
+        "departureDate": departure_date,
+        "returnDate": return_date,
+        "adults": adults,
+        "nonStop": nonstop,
+    }
+    response = await amadeus_get(
+        amadeus_url("/v2/shopping/flight-offers"),
+        params={name: value for name, value in params.items() if value},
+    )
+    return parse_flight_offers(response.json())
+
+
+def add_readable_flight_dates(response):
+    flights = response.get("data", [])
+    currency = response.get("meta", {}).get("currency")
+    airports = response["dictionaries"]["locations"]
+    for flight in flights:
+        flight[
+            "readable_origin"
+        ] = f"{airports[flight['origin']]['detailedName']} ({flight['origin']})"
+        flight[
+            "readable_destination"
+        ] = f"{airports[flight['destination']]['detailedName']} ({flight['destination']})"
+        departure_date = datetime.strptime(flight["departureDate"], "%Y-%m-%d")
+        flight["readable_departure"] = departure_date.strftime("%a %d %b %Y")
+        flight["offers_querystring"] = flight["links"]["flightOffers"].split("?")[1]
+        if flight.get("returnDate"):
+            return_date = datetime.strptime(flight["returnDate"], "%Y-%m-%d")
+            flight["readable_return"] = return_date.strftime("%a %d %b %Y")
+    return flights, currency
+
+
+async def sweep_cheapest_flights(origin_iata, cities, nonstop, trip_length):
+    semaphore = asyncio.Semaphore(settings.CHEAPEST_EVERYWHERE_CONCURRENCY)
+
+    async def get_cheapest_flight(city):
+        async with semaphore:
+            response = await asyncio.wait_for(
+                get_flight_dates(origin_iata, city["iataCode"], nonstop, trip_length),
+                settings.CHEAPEST_EVERYWHERE_TIMEOUT,
+            )
+        flights, currency = add_readable_flight_dates(response)
+        flight = min(flights, key=lambda flight: float(flight["price"]["total"]))
+        flight["city"] = city
+        flight["currency"] = currency
+        return flight
+
+    tasks = [asyncio.ensure_future(get_cheapest_flight(city)) for city in cities]
+    try:
+        for next_flight in asyncio.as_completed(tasks):
+            try:
+                yield await next_flight
+            except httpx.HTTPStatusError as exc:
+                logging.warning(
+                    f"Skipping destination after error response {exc.response.status_code} while requesting {exc.request.url}"
+                )
+            except httpx.RequestError as exc:
+                logging.warning(
+                    f"Skipping destination after an error requesting {exc.request.url}."
+                )
+            except (asyncio.TimeoutError, KeyError, ValueError) as exc:
+                logging.warning(f"Skipping destination without flight dates: {exc!r}")
+    finally:
+        for task in tasks:
+            task.cancel()
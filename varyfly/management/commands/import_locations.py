@@ -0,0 +1,114 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from varyfly.models import Location, normalize_location_name
+
+LOCATION_FIELDS = [
+    "sub_type",
+    "iata_code",
+    "name",
+    "city_code",
+    "city_name",
+    "country_code",
+    "country_name",
+    "latitude",
+    "longitude",
+]
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as dump:
+        yield from csv.DictReader(dump)
+
+
+def read_json(path):
+    with open(path, encoding="utf-8") as dump:
+        rows = json.load(dump)
+    if isinstance(rows, dict):
+        rows = rows.get("data", [])
+    for row in rows:
+        if "iataCode" in row:
+            address = row.get("address", {})
+            geo_code = row.get("geoCode") or {}
+            row = {
+                "sub_type": row.get("subType", "").upper(),
+                "iata_code": row["iataCode"],
+                "name": row.get("name", ""),
+                "city_code": address.get("cityCode", row["iataCode"]),
+                "city_name": address.get("cityName", row.get("name", "")),
+                "country_code": address.get("countryCode", ""),
+                "country_name": address.get("countryName", ""),
+                "latitude": geo_code.get("latitude"),
+                "longitude": geo_code.get("longitude"),
+            }
+        yield row
+
+
+def to_location(row):
+    sub_type = row["sub_type"].upper()
+    if sub_type not in (Location.CITY, Location.AIRPORT):
+        raise CommandError(f"Unknown location sub type {row['sub_type']!r}.")
+    return Location(
+        sub_type=sub_type,
+        iata_code=row["iata_code"].upper(),
+        name=row["name"],
+        normalized_name=normalize_location_name(row["name"]),
+        city_code=(row.get("city_code") or row["iata_code"]).upper(),
+        city_name=row.get("city_name") or row["name"],
+        country_code=row["country_code"].upper(),
+        country_name=row["country_name"],
+        latitude=float(row["latitude"]) if row.get("latitude") else None,
+        longitude=float(row["longitude"]) if row.get("longitude") else None,
+    )
+
+
+class Command(BaseCommand):
+    help = "Bulk import cities and airports from a CSV or JSON dump."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "json"])
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Delete every existing location before importing.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        dump_format = options["format"] or ("json" if path.endswith(".json") else "csv")
+        rows = read_json(path) if dump_format == "json" else read_csv(path)
+        batch_size = options["batch_size"]
+        imported = 0
+        with transaction.atomic():
+            if options["replace"]:
+                Location.objects.all().delete()
+            batch = {}
+            for row in rows:
+                location = to_location(row)
+                batch[(location.iata_code, location.sub_type)] = location
+                if len(batch) >= batch_size:
+                    imported += self.save_batch(batch.values())
+                    batch = {}
+            if batch:
+                imported += self.save_batch(batch.values())
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} locations."))
+
+    def save_batch(self, batch):
+        batch = list(batch)
+        Location.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=["iata_code", "sub_type"],
+            update_fields=[
+                field
+                for field in LOCATION_FIELDS
+                if field not in ("iata_code", "sub_type")
+            ]
+            + ["normalized_name"],
+        )
+        return len(batch)
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import random
+import time
+from datetime import date, timedelta
+
+import httpx
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from server.asgi import application
+from varyfly import urls
+from varyfly.helpers import (
+    close_client,
+    get_city_details,
+    home_city_choice,
+    open_client,
+)
+from varyfly.pricehistory import flush_prices
+from varyfly.standin.app import standin_app
+
+PERCENTILES = [50, 95, 99]
+
+
+def url_scenarios(home_city, destination):
+    destination_iata, destination_country_code = destination
+    departure_date = date.today() + timedelta(days=30)
+    destination_params = {
+        "destination_iata": destination_iata,
+        "country_code": destination_country_code,
+    }
+    return {
+        "home": ("GET", {}, None),
+        "save_home": ("POST", {}, {"city": home_city_choice(home_city)[0]}),
+        "destinations": ("GET", {}, None),
+        "destinations_country": (
+            "GET",
+            {"country_code": destination_country_code},
+            None,
+        ),
+        "safety": (
+            "GET",
+            {"city_iata": destination_iata, "country_code": destination_country_code},
+            None,
+        ),
+        "cheapest_flight_dates": ("POST", destination_params, {"trip_length": "7"}),
+        "busiest_travel_periods": ("GET", destination_params, None),
+        "price_calendar": ("GET", destination_params, None),
+        "price_trend": ("GET", destination_params, None),
+        "flight_search": (
+            "GET",
+            {
+                "originLocationCode": home_city["iataCode"],
+                "destinationLocationCode": destination_iata,
+                "departureDate": departure_date.isoformat(),
+                "returnDate": (departure_date + timedelta(days=7)).isoformat(),
+                "adults": 1,
+            },
+            None,
+        ),
+        "cheapest_everywhere": ("POST", {}, {"trip_length": "7"}),
+        "city_suggestions": ("GET", {"q": destination_iata[:2]}, None),
+    }
+
+
+def parse_city(city):
+    city_iata, _, country_code = city.upper().partition(":")
+    if not country_code:
+        raise CommandError(f"Expected a city like PAR:FR, got {city!r}.")
+    return city_iata, country_code
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test every varyfly URL against the ASGI app and report throughput "
+        "and latency percentiles per URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Per URL.")
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--home", default="LON:GB")
+        parser.add_argument("--destination", default="PAR:FR")
+        parser.add_argument(
+            "--standin",
+            action="store_true",
+            help="Answer Amadeus calls from the local stand-in instead of "
+            "AMADEUS_BASE_URL.",
+        )
+        parser.add_argument("--latency", type=float, default=0.05)
+        parser.add_argument("--error-rate", type=float, default=0)
+        parser.add_argument("--rate-limit-rate", type=float, default=0)
+        parser.add_argument("--seed", type=int)
+
+    def handle(self, *args, **options):
+        latencies, statuses, elapsed = asyncio.run(self.run(options))
+        self.report(latencies, statuses, elapsed)
+
+    async def run(self, options):
+        if options["standin"]:
+            os.environ.setdefault("AMADEUS_BASE_URL", "http://amadeus.standin")
+            open_client(
+                transport=httpx.ASGITransport(
+                    app=standin_app(
+                        latency=options["latency"],
+                        error_rate=options["error_rate"],
+                        rate_limit_rate=options["rate_limit_rate"],
+                        seed=options["seed"],
+                    )
+                )
+            )
+        home_city = await get_city_details(*parse_city(options["home"]))
+        scenarios = url_scenarios(home_city, parse_city(options["destination"]))
+        requests = [
+            (pattern.name, *scenarios.get(pattern.name, ("GET", {}, None)))
+            for pattern in urls.urlpatterns
+        ] * options["requests"]
+        random.Random(options["seed"]).shuffle(requests)
+        queue = asyncio.Queue()
+        for request in requests:
+            queue.put_nowait(request)
+        latencies = {}
+        statuses = {}
+        started_at = time.perf_counter()
+        try:
+            await asyncio.gather(
+                *(
+                    self.visitor(scenarios["save_home"][2], queue, latencies, statuses)
+                    for _ in range(options["concurrency"])
+                )
+            )
+        finally:
+            await close_client()
+            await flush_prices()
+        return latencies, statuses, time.perf_counter() - started_at
+
+    async def visitor(self, home, queue, latencies, statuses):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=application),
+            base_url="http://localhost",
+            timeout=None,
+        ) as client:
+            await client.get(reverse("home"))
+            await client.post(
+                reverse("save_home"),
+                data={**home, "csrfmiddlewaretoken": client.cookies.get("csrftoken")},
+            )
+            while not queue.empty():
+                name, method, params, data = queue.get_nowait()
+                if data is not None:
+                    data = {
+                        **data,
+                        "csrfmiddlewaretoken": client.cookies.get("csrftoken", ""),
+                    }
+                started_at = time.perf_counter()
+                try:
+                    response = await client.request(
+                        method, reverse(name), params=params, data=data
+                    )
+                    status = response.status_code
+                except httpx.HTTPError as exc:
+                    status = type(exc).__name__
+                latencies.setdefault(name, []).append(time.perf_counter() - started_at)
+                statuses.setdefault(name, {}).setdefault(status, 0)
+                statuses[name][status] += 1
+
+    def report(self, latencies, statuses, elapsed):
+        self.stdout.write(
+            f"{'URL':<24}{'requests':>9}{'req/s':>9}"
+            + "".join(f"{f'p{percentile} ms':>10}" for percentile in PERCENTILES)
+            + "  statuses"
+        )
+        for name, durations in latencies.items():
+            percentiles = np.percentile(np.array(durations) * 1000, PERCENTILES)
+            self.stdout.write(
+                f"{name:<24}{len(durations):>9}{len(durations) / elapsed:>9.1f}"
+                + "".join(f"{value:>10.1f}" for value in percentiles)
+                + "  "
+                + ", ".join(
+                    f"{status}: {count}" for status, count in statuses[name].items()
+                )
+            )
+        total = sum(len(durations) for durations in latencies.values())
+        self.stdout.write(
+            f"{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s)."
+        )
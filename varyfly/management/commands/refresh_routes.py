@@ -0,0 +1,85 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from varyfly.helpers import get_destination_cities_for_airport
+from varyfly.models import DirectRoute, RouteAirport
+from varyfly.routes import city_airports, has_no_routes, save_direct_routes
+
+
+class Command(BaseCommand):
+    help = "Refresh stale airport to city edges of the direct route graph."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "airports",
+            nargs="*",
+            help="Airport IATA codes to refresh. "
+            "Defaults to every stored airport older than --stale-after-hours.",
+        )
+        parser.add_argument("--stale-after-hours", type=float, default=24)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument(
+            "--expand",
+            action="store_true",
+            help="Also refresh the airports of every city these airports fly to, "
+            "so one-stop destinations can be computed from them.",
+        )
+
+    def handle(self, *args, **options):
+        airports = [airport.upper() for airport in options["airports"]]
+        if not airports:
+            stale_before = timezone.now() - timedelta(
+                hours=options["stale_after_hours"]
+            )
+            airports = list(
+                RouteAirport.objects.filter(refreshed_at__lt=stale_before).values_list(
+                    "airport_iata", flat=True
+                )
+            )
+        asyncio.run(
+            self.refresh(airports, options["concurrency"], options["batch_size"])
+        )
+        if options["expand"]:
+            cities = set(
+                DirectRoute.objects.filter(airport_iata__in=airports).values_list(
+                    "city_iata", flat=True
+                )
+            )
+            connecting_airports = sorted(set(city_airports(cities)) - set(airports))
+            asyncio.run(
+                self.refresh(
+                    connecting_airports, options["concurrency"], options["batch_size"]
+                )
+            )
+
+    async def refresh(self, airports, concurrency, batch_size):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get_destinations(airport_iata):
+            async with semaphore:
+                return await get_destination_cities_for_airport.__wrapped__(
+                    airport_iata
+                )
+
+        for start in range(0, len(airports), batch_size):
+            batch = airports[start : start + batch_size]
+            results = await asyncio.gather(
+                *(get_destinations(airport_iata) for airport_iata in batch),
+                return_exceptions=True,
+            )
+            refreshed_at = timezone.now()
+            for airport_iata, cities in zip(batch, results):
+                if has_no_routes(cities):
+                    cities = []
+                if isinstance(cities, Exception):
+                    self.stderr.write(f"Could not refresh {airport_iata}: {cities!r}")
+                    continue
+                await sync_to_async(save_direct_routes)(
+                    airport_iata, cities, refreshed_at
+                )
+                self.stdout.write(f"Stored {len(cities)} routes from {airport_iata}.")
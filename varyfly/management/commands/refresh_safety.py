@@ -0,0 +1,102 @@
+import asyncio
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from varyfly.helpers import (
+    get_city_details,
+    add_precise_city_lat_long,
+    get_safety_rated_locations,
+)
+from varyfly.models import SafetyArea, SafetyCity
+from varyfly.safety import filter_city_areas
+
+
+async def fetch_city_areas(city_iata, country_code, semaphore):
+    async with semaphore:
+        city = await get_city_details(city_iata, country_code)
+        city = await add_precise_city_lat_long(city, country_code)
+        areas = await get_safety_rated_locations.__wrapped__(
+            city["geoCode"]["latitude"], city["geoCode"]["longitude"]
+        )
+    return city, filter_city_areas(city["name"], areas)
+
+
+async def fetch_safety_datasets(cities, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(
+        *(
+            fetch_city_areas(city_iata, country_code, semaphore)
+            for city_iata, country_code in cities
+        ),
+        return_exceptions=True,
+    )
+
+
+class Command(BaseCommand):
+    help = "Refresh the stored safety-rated locations of cities."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "cities",
+            nargs="*",
+            help="City IATA and country codes such as PAR:FR. "
+            "Defaults to every stored city older than --stale-after-hours.",
+        )
+        parser.add_argument("--stale-after-hours", type=float, default=24)
+        parser.add_argument("--concurrency", type=int, default=2)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cities = []
+        for city in options["cities"]:
+            city_iata, _, country_code = city.upper().partition(":")
+            if not country_code:
+                raise CommandError(f"Expected a city like PAR:FR, got {city!r}.")
+            cities.append((city_iata, country_code))
+        if not cities:
+            stale_before = timezone.now() - timedelta(
+                hours=options["stale_after_hours"]
+            )
+            cities = list(
+                {
+                    (city["city_iata"], city["country_code"]): None
+                    for city in [
+                        *SafetyCity.objects.filter(
+                            refreshed_at__lt=stale_before
+                        ).values("city_iata", "country_code"),
+                        *SafetyArea.objects.values("city_iata", "country_code")
+                        .annotate(refreshed_at=Min("refreshed_at"))
+                        .filter(refreshed_at__lt=stale_before),
+                    ]
+                }
+            )
+        datasets = asyncio.run(fetch_safety_datasets(cities, options["concurrency"]))
+        for (city_iata, country_code), dataset in zip(cities, datasets):
+            if isinstance(dataset, Exception):
+                self.stderr.write(f"Could not refresh {city_iata}: {dataset!r}")
+                continue
+            city, areas = dataset
+            self.save_areas(city_iata, country_code, city, areas, options["batch_size"])
+            self.stdout.write(f"Stored {len(areas)} safety areas for {city_iata}.")
+
+    def save_areas(self, city_iata, country_code, city, areas, batch_size):
+        refreshed_at = timezone.now()
+        with transaction.atomic():
+            SafetyCity.objects.filter(city_iata=city_iata).delete()
+            SafetyCity.from_amadeus_city(
+                city_iata, country_code, city, refreshed_at
+            ).save()
+            SafetyArea.objects.filter(city_iata=city_iata).delete()
+            SafetyArea.objects.bulk_create(
+                [
+                    SafetyArea.from_amadeus_area(
+                        city_iata, country_code, area, refreshed_at
+                    )
+                    for area in {area["id"]: area for area in areas}.values()
+                ],
+                batch_size=batch_size,
+            )
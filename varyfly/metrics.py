@@ -0,0 +1,207 @@
+import bisect
+import contextlib
+import functools
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import markcoroutinefunction
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.template.backends.django import DjangoTemplates
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SERVER_TIMINGS = ("token", "upstream", "render", "session")
+
+_request_timings = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in sorted(self.series.items()):
+            label_text = format_labels(self.label_names, labels)
+            cumulative = 0
+            for bucket, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{label_text},le="{bucket}"}} {cumulative}'
+            yield f"{self.name}_sum{{{label_text}}} {total}"
+            yield f"{self.name}_count{{{label_text}}} {cumulative}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.series = {}
+
+    def inc(self, labels, value=1):
+        self.series[labels] = self.series.get(labels, 0) + value
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in sorted(self.series.items()):
+            yield f"{self.name}{{{format_labels(self.label_names, labels)}}} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels, value):
+        self.series[labels] = value
+
+
+def format_labels(label_names, labels):
+    return ",".join(f'{name}="{value}"' for name, value in zip(label_names, labels))
+
+
+view_duration = Histogram(
+    "varyfly_view_duration_seconds",
+    "Time until each view returned its response headers.",
+    ("view",),
+)
+upstream_duration = Histogram(
+    "varyfly_upstream_duration_seconds",
+    "Amadeus call latency including retries.",
+    ("endpoint",),
+)
+upstream_requests = Counter(
+    "varyfly_upstream_requests_total",
+    "Amadeus calls by final status.",
+    ("endpoint", "status"),
+)
+upstream_bytes = Counter(
+    "varyfly_upstream_response_bytes_total",
+    "Amadeus response body bytes.",
+    ("endpoint",),
+)
+upstream_retries = Counter(
+    "varyfly_upstream_retries_total",
+    "Amadeus calls retried after a 429.",
+    ("endpoint",),
+)
+METRICS = [
+    view_duration,
+    upstream_duration,
+    upstream_requests,
+    upstream_bytes,
+    upstream_retries,
+]
+
+
+def observe_upstream(endpoint, status, seconds, size, retries):
+    upstream_duration.observe((endpoint,), seconds)
+    upstream_requests.inc((endpoint, str(status)))
+    upstream_bytes.inc((endpoint,), size)
+    if retries:
+        upstream_retries.inc((endpoint,), retries)
+
+
+def prometheus_text(*counters):
+    return (
+        "\n".join(line for metric in (*METRICS, *counters) for line in metric.lines())
+        + "\n"
+    )
+
+
+@contextlib.contextmanager
+def timing(name):
+    timings = _request_timings.get()
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + time.perf_counter() - started_at
+
+
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timing(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def server_timing_header(timings):
+    return ", ".join(
+        f"{name};dur={timings[name] * 1000:.1f}"
+        for name in (*SERVER_TIMINGS, "total")
+        if name in timings
+    )
+
+
+class ServerTimingMiddleware:
+    async_capable = True
+    sync_capable = False
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        timings = {}
+        token = _request_timings.set(timings)
+        started_at = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        timings["total"] = time.perf_counter() - started_at
+        response["Server-Timing"] = server_timing_header(timings)
+        view_duration.observe(
+            (getattr(request.resolver_match, "url_name", None) or "unmatched",),
+            timings["total"],
+        )
+        return response
+
+
+class SessionTimingMiddleware(SessionMiddleware):
+    def process_request(self, request):
+        with timing("session"):
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        with timing("session"):
+            return super().process_response(request, response)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timing("render"):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
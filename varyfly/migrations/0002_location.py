@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("varyfly", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Location",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "sub_type",
+                    models.CharField(
+                        choices=[("CITY", "City"), ("AIRPORT", "Airport")], max_length=7
+                    ),
+                ),
+                ("iata_code", models.CharField(max_length=3)),
+                ("name", models.CharField(max_length=255)),
+                ("normalized_name", models.CharField(max_length=255)),
+                ("city_code", models.CharField(max_length=3)),
+                ("city_name", models.CharField(max_length=255)),
+                ("country_code", models.CharField(max_length=2)),
+                ("country_name", models.CharField(max_length=255)),
+                ("latitude", models.FloatField(blank=True, null=True)),
+                ("longitude", models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["country_code", "sub_type"],
+                        name="location_country_code",
+                    ),
+                    models.Index(
+                        fields=["city_code", "sub_type"], name="location_city_code"
+                    ),
+                    models.Index(
+                        fields=["normalized_name"],
+                        name="location_name_prefix",
+                        opclasses=["varchar_pattern_ops"],
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="location",
+            constraint=models.UniqueConstraint(
+                fields=("iata_code", "sub_type"), name="unique_location_iata_code"
+            ),
+        ),
+    ]
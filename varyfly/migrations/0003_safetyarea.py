@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("varyfly", "0002_location"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SafetyArea",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("city_iata", models.CharField(max_length=3)),
+                ("country_code", models.CharField(max_length=2)),
+                ("amadeus_id", models.CharField(max_length=64)),
+                ("sub_type", models.CharField(max_length=64)),
+                ("name", models.CharField(max_length=255)),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("grid_latitude", models.IntegerField()),
+                ("grid_longitude", models.IntegerField()),
+                ("overall", models.PositiveSmallIntegerField(null=True)),
+                ("medical", models.PositiveSmallIntegerField(null=True)),
+                ("lgbtq", models.PositiveSmallIntegerField(null=True)),
+                ("physical_harm", models.PositiveSmallIntegerField(null=True)),
+                ("theft", models.PositiveSmallIntegerField(null=True)),
+                ("political_freedom", models.PositiveSmallIntegerField(null=True)),
+                ("women", models.PositiveSmallIntegerField(null=True)),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["city_iata", "grid_latitude", "grid_longitude"],
+                        name="safety_area_grid",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="safetyarea",
+            constraint=models.UniqueConstraint(
+                fields=("city_iata", "amadeus_id"), name="unique_safety_area"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("varyfly", "0003_safetyarea"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DirectRoute",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("airport_iata", models.CharField(max_length=3)),
+                ("city_iata", models.CharField(max_length=3)),
+                ("city_name", models.CharField(max_length=255)),
+                ("country_code", models.CharField(max_length=2)),
+                ("country_name", models.CharField(max_length=255)),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="directroute",
+            constraint=models.UniqueConstraint(
+                fields=("airport_iata", "city_iata"), name="unique_direct_route"
+            ),
+        ),
+    ]
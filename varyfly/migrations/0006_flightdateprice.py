@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("varyfly", "0005_travelprofile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FlightDatePrice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("origin", models.CharField(max_length=3)),
+                ("destination", models.CharField(max_length=3)),
+                ("nonstop", models.BooleanField()),
+                ("duration", models.PositiveSmallIntegerField()),
+                ("departure_date", models.DateField()),
+                ("observed_at", models.DateTimeField()),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("currency", models.CharField(max_length=3)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=[
+                            "origin",
+                            "destination",
+                            "nonstop",
+                            "duration",
+                            "observed_at",
+                        ],
+                        name="flight_date_price_trend",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="flightdateprice",
+            constraint=models.UniqueConstraint(
+                fields=(
+                    "origin",
+                    "destination",
+                    "nonstop",
+                    "duration",
+                    "departure_date",
+                    "observed_at",
+                ),
+                name="unique_flight_date_price",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("varyfly", "0006_flightdateprice"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SafetyCity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("city_iata", models.CharField(max_length=3, unique=True)),
+                ("country_code", models.CharField(max_length=2)),
+                ("name", models.CharField(max_length=255)),
+                ("country_name", models.CharField(max_length=255)),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+        ),
+    ]
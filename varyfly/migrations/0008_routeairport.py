@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:30
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def record_route_airports(apps, schema_editor):
+    DirectRoute = apps.get_model("varyfly", "DirectRoute")
+    RouteAirport = apps.get_model("varyfly", "RouteAirport")
+    RouteAirport.objects.bulk_create(
+        RouteAirport(
+            airport_iata=route["airport_iata"], refreshed_at=route["refreshed_at"]
+        )
+        for route in DirectRoute.objects.values("airport_iata").annotate(
+            refreshed_at=Min("refreshed_at")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("varyfly", "0007_safetycity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RouteAirport",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("airport_iata", models.CharField(max_length=3, unique=True)),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(record_route_airports, migrations.RunPython.noop),
+    ]
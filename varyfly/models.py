@@ -1,8 +1,298 @@
+import math
+import unicodedata
 import uuid
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
+def normalize_location_name(name):
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return " ".join(name.casefold().replace("/", " ").replace("-", " ").split())
+
+
 class User(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+
+class Location(models.Model):
+    CITY = "CITY"
+    AIRPORT = "AIRPORT"
+    SUB_TYPES = [(CITY, "City"), (AIRPORT, "Airport")]
+
+    sub_type = models.CharField(max_length=7, choices=SUB_TYPES)
+    iata_code = models.CharField(max_length=3)
+    name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255)
+    city_code = models.CharField(max_length=3)
+    city_name = models.CharField(max_length=255)
+    country_code = models.CharField(max_length=2)
+    country_name = models.CharField(max_length=255)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["iata_code", "sub_type"], name="unique_location_iata_code"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["country_code", "sub_type"], name="location_country_code"
+            ),
+            models.Index(fields=["city_code", "sub_type"], name="location_city_code"),
+            models.Index(
+                fields=["normalized_name"],
+                name="location_name_prefix",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.iata_code})"
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_location_name(self.name)
+        super().save(*args, **kwargs)
+
+    def as_amadeus_location(self):
+        return {
+            "type": "location",
+            "subType": self.sub_type,
+            "name": self.name,
+            "iataCode": self.iata_code,
+            "address": {
+                "cityName": self.city_name,
+                "cityCode": self.city_code,
+                "countryName": self.country_name,
+                "countryCode": self.country_code,
+            },
+            "geoCode": {"latitude": self.latitude, "longitude": self.longitude},
+        }
+
+
+class SafetyArea(models.Model):
+    GRID_SIZE = 0.05
+    SCORES = [
+        ("overall", "overall"),
+        ("medical", "medical"),
+        ("lgbtq", "lgbtq"),
+        ("physical_harm", "physicalHarm"),
+        ("theft", "theft"),
+        ("political_freedom", "politicalFreedom"),
+        ("women", "women"),
+    ]
+
+    city_iata = models.CharField(max_length=3)
+    country_code = models.CharField(max_length=2)
+    amadeus_id = models.CharField(max_length=64)
+    sub_type = models.CharField(max_length=64)
+    name = models.CharField(max_length=255)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    grid_latitude = models.IntegerField()
+    grid_longitude = models.IntegerField()
+    overall = models.PositiveSmallIntegerField(null=True)
+    medical = models.PositiveSmallIntegerField(null=True)
+    lgbtq = models.PositiveSmallIntegerField(null=True)
+    physical_harm = models.PositiveSmallIntegerField(null=True)
+    theft = models.PositiveSmallIntegerField(null=True)
+    political_freedom = models.PositiveSmallIntegerField(null=True)
+    women = models.PositiveSmallIntegerField(null=True)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["city_iata", "amadeus_id"], name="unique_safety_area"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["city_iata", "grid_latitude", "grid_longitude"],
+                name="safety_area_grid",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.sub_type}: {self.name}"
+
+    @classmethod
+    def grid_cell(cls, latitude, longitude):
+        return (
+            math.floor(latitude / cls.GRID_SIZE),
+            math.floor(longitude / cls.GRID_SIZE),
+        )
+
+    @classmethod
+    def from_amadeus_area(cls, city_iata, country_code, area, refreshed_at):
+        latitude = float(area["geoCode"]["latitude"])
+        longitude = float(area["geoCode"]["longitude"])
+        grid_latitude, grid_longitude = cls.grid_cell(latitude, longitude)
+        scores = area.get("safetyScores", {})
+        return cls(
+            city_iata=city_iata,
+            country_code=country_code,
+            amadeus_id=area["id"],
+            sub_type=area.get("subType", ""),
+            name=area["name"],
+            latitude=latitude,
+            longitude=longitude,
+            grid_latitude=grid_latitude,
+            grid_longitude=grid_longitude,
+            refreshed_at=refreshed_at,
+            **{field: scores.get(score) for field, score in cls.SCORES},
+        )
+
+    def as_amadeus_area(self):
+        return {
+            "id": self.amadeus_id,
+            "subType": self.sub_type,
+            "name": self.name,
+            "geoCode": {"latitude": self.latitude, "longitude": self.longitude},
+            "safetyScores": {
+                score: getattr(self, field) for field, score in self.SCORES
+            },
+        }
+
+
+class SafetyCity(models.Model):
+    city_iata = models.CharField(max_length=3, unique=True)
+    country_code = models.CharField(max_length=2)
+    name = models.CharField(max_length=255)
+    country_name = models.CharField(max_length=255)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} ({self.city_iata})"
+
+    @classmethod
+    def from_amadeus_city(cls, city_iata, country_code, city, refreshed_at):
+        return cls(
+            city_iata=city_iata,
+            country_code=country_code,
+            name=city["name"],
+            country_name=city["address"]["countryName"],
+            latitude=float(city["geoCode"]["latitude"]),
+            longitude=float(city["geoCode"]["longitude"]),
+            refreshed_at=refreshed_at,
+        )
+
+    def as_amadeus_city(self):
+        return {
+            "name": self.name,
+            "iataCode": self.city_iata,
+            "address": {
+                "countryCode": self.country_code,
+                "countryName": self.country_name,
+            },
+            "geoCode": {"latitude": self.latitude, "longitude": self.longitude},
+        }
+
+
+class DirectRoute(models.Model):
+    airport_iata = models.CharField(max_length=3)
+    city_iata = models.CharField(max_length=3)
+    city_name = models.CharField(max_length=255)
+    country_code = models.CharField(max_length=2)
+    country_name = models.CharField(max_length=255)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["airport_iata", "city_iata"], name="unique_direct_route"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.airport_iata} -> {self.city_iata}"
+
+    @classmethod
+    def from_amadeus_location(cls, airport_iata, city, refreshed_at):
+        return cls(
+            airport_iata=airport_iata,
+            city_iata=city["iataCode"],
+            city_name=city["name"],
+            country_code=city["address"]["countryCode"],
+            country_name=city["address"]["countryName"],
+            refreshed_at=refreshed_at,
+        )
+
+
+class RouteAirport(models.Model):
+    airport_iata = models.CharField(max_length=3, unique=True)
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.airport_iata} refreshed at {self.refreshed_at}"
+
+
+class TravelProfile(models.Model):
+    FIELDS = ("home_city", "travel_preferences")
+
+    visitor_id = models.UUIDField(unique=True)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE)
+    home_city = models.JSONField(default=dict)
+    travel_preferences = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id or self.visitor_id}: {self.home_city.get('iata', '')}"
+
+
+class FlightDatePrice(models.Model):
+    ONE_WAY = 0
+
+    origin = models.CharField(max_length=3)
+    destination = models.CharField(max_length=3)
+    nonstop = models.BooleanField()
+    duration = models.PositiveSmallIntegerField()
+    departure_date = models.DateField()
+    observed_at = models.DateTimeField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "origin",
+                    "destination",
+                    "nonstop",
+                    "duration",
+                    "departure_date",
+                    "observed_at",
+                ],
+                name="unique_flight_date_price",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["origin", "destination", "nonstop", "duration", "observed_at"],
+                name="flight_date_price_trend",
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.origin}-{self.destination} {self.departure_date}: "
+            f"{self.price} {self.currency}"
+        )
+
+    @classmethod
+    def from_amadeus_flight_date(cls, flight, nonstop, duration, currency, observed_at):
+        return cls(
+            origin=flight["origin"],
+            destination=flight["destination"],
+            nonstop=nonstop,
+            duration=duration,
+            departure_date=flight["departureDate"],
+            observed_at=observed_at,
+            price=flight["price"]["total"],
+            currency=currency,
+        )
@@ -0,0 +1,121 @@
+import re
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+
+ISO_DURATION = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?")
+
+
+def duration_minutes(duration):
+    match = ISO_DURATION.fullmatch(duration or "")
+    if not match:
+        return 0
+    days, hours, minutes = (int(part or 0) for part in match.groups())
+    return (days * 24 + hours) * 60 + minutes
+
+
+def readable_duration(minutes):
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+
+def readable_time(timestamp):
+    return datetime.fromisoformat(timestamp).strftime("%a %d %b %H:%M")
+
+
+@dataclass(slots=True)
+class Itinerary:
+    origin: str
+    destination: str
+    departs_at: str
+    arrives_at: str
+    duration_minutes: int
+    stops: int
+    carriers: tuple
+
+    @property
+    def readable_duration(self):
+        return readable_duration(self.duration_minutes)
+
+
+@dataclass(slots=True)
+class FlightOffer:
+    price: float
+    currency: str
+    itineraries: tuple
+    stops: int
+    duration_minutes: int
+    seats: int
+
+    @property
+    def readable_duration(self):
+        return readable_duration(self.duration_minutes)
+
+
+def parse_itinerary(itinerary, carriers):
+    segments = itinerary["segments"]
+    return Itinerary(
+        origin=sys.intern(segments[0]["departure"]["iataCode"]),
+        destination=sys.intern(segments[-1]["arrival"]["iataCode"]),
+        departs_at=readable_time(segments[0]["departure"]["at"]),
+        arrives_at=readable_time(segments[-1]["arrival"]["at"]),
+        duration_minutes=duration_minutes(itinerary.get("duration")),
+        stops=len(segments)
+        - 1
+        + sum(segment.get("numberOfStops", 0) for segment in segments),
+        carriers=tuple(
+            dict.fromkeys(
+                carriers.get(segment["carrierCode"], segment["carrierCode"])
+                for segment in segments
+            )
+        ),
+    )
+
+
+def parse_flight_offers(response):
+    dictionaries = response.get("dictionaries", {})
+    carriers = {
+        sys.intern(code): sys.intern(name.title())
+        for code, name in dictionaries.get("carriers", {}).items()
+    }
+    offers = []
+    for offer in response.get("data", []):
+        itineraries = tuple(
+            parse_itinerary(itinerary, carriers) for itinerary in offer["itineraries"]
+        )
+        offers.append(
+            FlightOffer(
+                price=float(offer["price"]["grandTotal"]),
+                currency=sys.intern(offer["price"]["currency"]),
+                itineraries=itineraries,
+                stops=max(itinerary.stops for itinerary in itineraries),
+                duration_minutes=sum(
+                    itinerary.duration_minutes for itinerary in itineraries
+                ),
+                seats=offer.get("numberOfBookableSeats", 0),
+            )
+        )
+    return offers
+
+
+FLIGHT_OFFER_SORT_KEYS = {
+    "price": lambda offer: (offer.price, offer.duration_minutes),
+    "duration": lambda offer: (offer.duration_minutes, offer.price),
+    "stops": lambda offer: (offer.stops, offer.price),
+}
+
+
+def sort_and_filter_flight_offers(
+    offers, sort="price", max_stops=None, max_price=None, max_duration_hours=None
+):
+    if max_stops is not None:
+        offers = [offer for offer in offers if offer.stops <= max_stops]
+    if max_price is not None:
+        offers = [offer for offer in offers if offer.price <= max_price]
+    if max_duration_hours is not None:
+        offers = [
+            offer
+            for offer in offers
+            if max(itinerary.duration_minutes for itinerary in offer.itineraries)
+            <= max_duration_hours * 60
+        ]
+    return sorted(offers, key=FLIGHT_OFFER_SORT_KEYS[sort])
@@ -0,0 +1,21 @@
+import collections
+import threading
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def pool_stats():
+    stats = collections.Counter()
+    with pools_lock:
+        for pool in pools.values():
+            stats.update(pool.get_stats())
+    return dict(stats)
+
+
+def close_pools():
+    with pools_lock:
+        closing = list(pools.values())
+        pools.clear()
+    for pool in closing:
+        pool.close()
@@ -0,0 +1,151 @@
+import asyncio
+import contextvars
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from varyfly.models import FlightDatePrice
+
+TREND_RESOLUTIONS = (
+    ("hour", timedelta(hours=1)),
+    ("day", timedelta(days=1)),
+    ("week", timedelta(weeks=1)),
+)
+TREND_LABEL_FORMATS = {
+    "hour": "d M H:i",
+    "day": "d M Y",
+    "week": "d M Y",
+    "month": "M Y",
+}
+
+_pending_prices = []
+_flush_task = None
+
+
+def trip_length_duration(trip_length):
+    if trip_length in [f"{i}" for i in range(1, 16)]:
+        return int(trip_length)
+    return FlightDatePrice.ONE_WAY
+
+
+def observation_time():
+    interval = settings.FLIGHT_PRICE_OBSERVATION_INTERVAL
+    now = timezone.now()
+    return now - timedelta(seconds=now.timestamp() % interval)
+
+
+def record_flight_dates(nonstop, trip_length, response):
+    currency = response.get("meta", {}).get("currency", "")
+    duration = trip_length_duration(trip_length)
+    observed_at = observation_time()
+    for flight in response.get("data", []):
+        try:
+            _pending_prices.append(
+                FlightDatePrice.from_amadeus_flight_date(
+                    flight, bool(nonstop), duration, currency, observed_at
+                )
+            )
+        except (KeyError, TypeError) as exc:
+            logging.warning(f"Skipping flight date without a price: {exc!r}")
+    if _pending_prices:
+        schedule_flush()
+
+
+def save_prices(prices):
+    try:
+        FlightDatePrice.objects.bulk_create(
+            prices, batch_size=settings.FLIGHT_PRICE_BATCH_SIZE, ignore_conflicts=True
+        )
+    finally:
+        close_old_connections()
+
+
+async def flush_prices():
+    global _pending_prices
+    prices, _pending_prices = _pending_prices, []
+    if not prices:
+        return
+    try:
+        await sync_to_async(save_prices)(prices)
+    except DatabaseError as exc:
+        logging.error(f"Failed to save {len(prices)} flight date prices: {exc!r}")
+
+
+def save_pending_prices():
+    global _pending_prices
+    prices, _pending_prices = _pending_prices, []
+    if not prices:
+        return
+    try:
+        save_prices(prices)
+    except DatabaseError as exc:
+        logging.error(f"Failed to save {len(prices)} flight date prices: {exc!r}")
+
+
+async def flush_prices_later():
+    await asyncio.sleep(settings.FLIGHT_PRICE_FLUSH_INTERVAL)
+    await flush_prices()
+
+
+def _flush_done(task):
+    global _flush_task
+    if _flush_task is task:
+        _flush_task = None
+    if not task.cancelled() and task.exception() is not None:
+        logging.warning(f"Flight date price flush failed: {task.exception()!r}")
+
+
+def schedule_flush():
+    global _flush_task
+    loop = asyncio.get_running_loop()
+    if (
+        _flush_task is not None
+        and not _flush_task.done()
+        and _flush_task.get_loop() is loop
+    ):
+        return
+    # Run outside the request's context so the write neither uses the
+    # request's ORM thread nor counts against its deadline and timings.
+    _flush_task = contextvars.Context().run(loop.create_task, flush_prices_later())
+    _flush_task.add_done_callback(_flush_done)
+
+
+def trend_resolution(first_observed_at, last_observed_at):
+    span = last_observed_at - first_observed_at
+    for resolution, bucket in TREND_RESOLUTIONS:
+        if span / bucket <= settings.PRICE_TREND_MAX_POINTS:
+            return resolution
+    return "month"
+
+
+async def get_price_trend(origin_iata, destination_iata, nonstop, duration):
+    prices = FlightDatePrice.objects.filter(
+        origin=origin_iata,
+        destination=destination_iata,
+        nonstop=nonstop,
+        duration=duration,
+    )
+    observed = await prices.aaggregate(
+        first=Min("observed_at"), last=Max("observed_at")
+    )
+    if observed["first"] is None:
+        return None, []
+    resolution = trend_resolution(observed["first"], observed["last"])
+    return resolution, [
+        point
+        async for point in prices.annotate(bucket=Trunc("observed_at", resolution))
+        .values("bucket")
+        .annotate(
+            min_price=Min("price"),
+            avg_price=Avg("price"),
+            departure_dates=Count("departure_date", distinct=True),
+            currency=Max("currency"),
+        )
+        .order_by("bucket")
+    ]
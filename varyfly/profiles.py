@@ -0,0 +1,41 @@
+import logging
+import uuid
+
+from django.contrib.auth import SESSION_KEY
+from django.db import DatabaseError
+
+from varyfly.models import TravelProfile
+
+
+def session_user_id(request):
+    user_id = request.session.get(SESSION_KEY)
+    return uuid.UUID(user_id) if user_id else None
+
+
+def session_visitor_id(request):
+    if "visitor_id" not in request.session:
+        request.session["visitor_id"] = str(uuid.uuid4())
+    return uuid.UUID(request.session["visitor_id"])
+
+
+async def load_user_profile(user_id):
+    try:
+        return (
+            await TravelProfile.objects.filter(user_id=user_id)
+            .order_by("-updated_at")
+            .values(*TravelProfile.FIELDS)
+            .afirst()
+        )
+    except DatabaseError as exc:
+        logging.error(f"Failed to load travel profile for {user_id}: {exc!r}")
+        return None
+
+
+async def save_profile(visitor_id, user_id, **fields):
+    defaults = {**fields, "user_id": user_id} if user_id else fields
+    try:
+        await TravelProfile.objects.aupdate_or_create(
+            visitor_id=visitor_id, defaults=defaults
+        )
+    except DatabaseError as exc:
+        logging.error(f"Failed to save travel profile {visitor_id}: {exc!r}")
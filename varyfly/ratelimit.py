@@ -0,0 +1,80 @@
+import asyncio
+import contextlib
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+_rate_limiter = None
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    def __init__(self, budgets, max_concurrency):
+        self.budgets = budgets
+        self.buckets = {}
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.loop = asyncio.get_running_loop()
+
+    def bucket(self, endpoint):
+        if endpoint not in self.buckets:
+            budget = self.budgets.get(endpoint, self.budgets["default"])
+            self.buckets[endpoint] = TokenBucket(budget["rate"], budget["burst"])
+        return self.buckets[endpoint]
+
+    @contextlib.asynccontextmanager
+    async def limit(self, endpoint):
+        await self.bucket(endpoint).acquire()
+        async with self.semaphore:
+            yield
+
+
+def get_rate_limiter():
+    global _rate_limiter
+    if _rate_limiter is None or _rate_limiter.loop is not asyncio.get_running_loop():
+        _rate_limiter = RateLimiter(
+            settings.AMADEUS_RATE_LIMITS, settings.AMADEUS_MAX_CONCURRENCY
+        )
+    return _rate_limiter
+
+
+def retry_delay(response, attempt):
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = (
+                    parsedate_to_datetime(retry_after) - timezone.now()
+                ).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0), settings.AMADEUS_RETRY_MAX_DELAY)
+    backoff = min(
+        settings.AMADEUS_RETRY_MAX_DELAY,
+        settings.AMADEUS_RETRY_BASE_DELAY * 2**attempt,
+    )
+    return random.uniform(backoff / 2, backoff)
@@ -0,0 +1,325 @@
+import asyncio
+import collections
+import logging
+import time
+
+import httpx
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from varyfly.deadline import mark_partial, remaining_time
+from varyfly.helpers import get_destination_cities_for_airport
+from varyfly.models import DirectRoute, Location, RouteAirport
+
+_route_graph = None
+
+
+class RouteGraph:
+    def __init__(self, routes, airports_by_city):
+        self.codes = []
+        self.ids = {}
+        self.cities = {}
+        destinations = {}
+        for airport_iata, city_iata, city_name, country_code, country_name in routes:
+            city_id = self.intern(city_iata)
+            destinations.setdefault(self.intern(airport_iata), set()).add(city_id)
+            self.cities[city_id] = {
+                "city_iata": city_iata,
+                "city_name": city_name,
+                "country_code": country_code,
+                "country_name": country_name,
+            }
+        airports = {}
+        for city_iata, airport_iata in airports_by_city:
+            if airport_iata in self.ids and city_iata in self.ids:
+                airports.setdefault(self.ids[city_iata], set()).add(
+                    self.ids[airport_iata]
+                )
+        for city_id in self.cities:
+            if city_id in destinations:
+                airports.setdefault(city_id, set()).add(city_id)
+        self.destinations = [
+            frozenset(destinations.get(node_id, ()))
+            for node_id in range(len(self.codes))
+        ]
+        self.airports = [
+            frozenset(airports.get(node_id, ())) for node_id in range(len(self.codes))
+        ]
+        self.loaded_at = time.monotonic()
+        self._reachable = {}
+
+    def intern(self, code):
+        if code not in self.ids:
+            self.ids[code] = len(self.codes)
+            self.codes.append(code)
+        return self.ids[code]
+
+    def reachable(self, airport_ids, stops):
+        key = (airport_ids, stops)
+        if key not in self._reachable:
+            cities = frozenset().union(
+                *(self.destinations[airport_id] for airport_id in airport_ids)
+            )
+            levels = [cities]
+            visited = set(cities)
+            for _ in range(stops):
+                airport_ids = frozenset().union(
+                    *(self.airports[city_id] for city_id in levels[-1])
+                )
+                cities = (
+                    frozenset().union(
+                        *(self.destinations[airport_id] for airport_id in airport_ids)
+                    )
+                    - visited
+                )
+                levels.append(cities)
+                visited |= cities
+            self._reachable[key] = levels
+        return self._reachable[key]
+
+    def destination_cities(self, home_city, stops):
+        airport_ids = frozenset(
+            self.ids[airport_iata]
+            for airport_iata in home_city["airports"]
+            if airport_iata in self.ids
+        )
+        home_city_id = self.ids.get(home_city["iata"])
+        return [
+            destination_city(self.cities[city_id])
+            for city_id in self.reachable(airport_ids, stops)[stops]
+            if city_id != home_city_id
+        ]
+
+
+def airports_by_city(city_codes=None):
+    airports = Location.objects.filter(sub_type=Location.AIRPORT)
+    if city_codes is not None:
+        airports = airports.filter(city_code__in=city_codes)
+    return airports.values_list("city_code", "iata_code")
+
+
+def load_route_graph():
+    global _route_graph
+    _route_graph = RouteGraph(
+        DirectRoute.objects.values_list(
+            "airport_iata", "city_iata", "city_name", "country_code", "country_name"
+        ).iterator(),
+        airports_by_city().iterator(),
+    )
+    return _route_graph
+
+
+async def get_route_graph():
+    if (
+        _route_graph is None
+        or time.monotonic() - _route_graph.loaded_at > settings.ROUTE_GRAPH_TTL
+    ):
+        return await sync_to_async(load_route_graph)()
+    return _route_graph
+
+
+def destination_city(route):
+    return {
+        "type": "location",
+        "subType": "city",
+        "name": route["city_name"],
+        "iataCode": route["city_iata"],
+        "address": {
+            "countryName": route["country_name"],
+            "countryCode": route["country_code"],
+        },
+    }
+
+
+def save_direct_routes(airport_iata, cities, refreshed_at):
+    with transaction.atomic():
+        DirectRoute.objects.bulk_create(
+            [
+                DirectRoute.from_amadeus_location(airport_iata, city, refreshed_at)
+                for city in {city["iataCode"]: city for city in cities}.values()
+            ],
+            update_conflicts=True,
+            unique_fields=["airport_iata", "city_iata"],
+            update_fields=["city_name", "country_code", "country_name", "refreshed_at"],
+        )
+        DirectRoute.objects.filter(
+            airport_iata=airport_iata, refreshed_at__lt=refreshed_at
+        ).delete()
+        RouteAirport.objects.update_or_create(
+            airport_iata=airport_iata, defaults={"refreshed_at": refreshed_at}
+        )
+
+
+def has_no_routes(exc):
+    return (
+        isinstance(exc, httpx.HTTPStatusError)
+        and exc.response.status_code < 500
+        and exc.response.status_code != 429
+    )
+
+
+async def find_missing_airports(airports):
+    stored_airports = {
+        airport_iata
+        async for airport_iata in RouteAirport.objects.filter(
+            airport_iata__in=airports
+        ).values_list("airport_iata", flat=True)
+    }
+    return [
+        airport_iata for airport_iata in airports if airport_iata not in stored_airports
+    ]
+
+
+async def add_missing_airports(airports):
+    missing_airports = await find_missing_airports(airports)
+    if not missing_airports:
+        return False
+    semaphore = asyncio.Semaphore(settings.ROUTE_FETCH_CONCURRENCY)
+
+    async def get_destinations(airport_iata):
+        async with semaphore:
+            return await get_destination_cities_for_airport(airport_iata)
+
+    tasks = {
+        airport_iata: asyncio.ensure_future(get_destinations(airport_iata))
+        for airport_iata in missing_airports
+    }
+    try:
+        done, pending = await asyncio.wait(tasks.values(), timeout=remaining_time())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    if pending:
+        mark_partial()
+    refreshed_at = timezone.now()
+    added = False
+    for airport_iata, task in tasks.items():
+        if task not in done:
+            continue
+        exc = task.exception()
+        if has_no_routes(exc):
+            logging.warning(
+                f"Storing {airport_iata} without routes after error response {exc.response.status_code} while requesting {exc.request.url}"
+            )
+            await sync_to_async(save_direct_routes)(airport_iata, [], refreshed_at)
+        elif isinstance(exc, httpx.HTTPStatusError):
+            logging.warning(
+                f"Skipping {airport_iata} after error response {exc.response.status_code} while requesting {exc.request.url}"
+            )
+            mark_partial()
+        elif isinstance(exc, httpx.RequestError):
+            logging.warning(
+                f"Skipping {airport_iata} after an error requesting {exc.request.url}."
+            )
+            mark_partial()
+        elif isinstance(exc, asyncio.TimeoutError):
+            mark_partial()
+        elif exc is not None:
+            raise exc
+        else:
+            await sync_to_async(save_direct_routes)(
+                airport_iata, task.result(), refreshed_at
+            )
+            added = added or bool(task.result())
+    return added
+
+
+def city_airports(city_codes):
+    return (
+        Location.objects.filter(sub_type=Location.AIRPORT)
+        .filter(Q(city_code__in=city_codes) | Q(iata_code__in=city_codes))
+        .values_list("iata_code", flat=True)
+    )
+
+
+async def connecting_airports(home_city):
+    cities = {
+        city_iata
+        async for city_iata in direct_routes_from(home_city)
+        .values_list("city_iata", flat=True)
+        .distinct()
+    }
+    airports = {airport_iata async for airport_iata in city_airports(cities)}
+    return sorted(airports - set(home_city["airports"]))
+
+
+def direct_routes_from(home_city, country_code=None):
+    routes = DirectRoute.objects.filter(airport_iata__in=home_city["airports"]).exclude(
+        city_iata=home_city["iata"]
+    )
+    if country_code is not None:
+        routes = routes.filter(country_code=country_code)
+    return routes
+
+
+async def get_direct_destination_cities(home_city, country_code=None):
+    await add_missing_airports(home_city["airports"])
+    return [
+        destination_city(route)
+        async for route in direct_routes_from(home_city, country_code)
+        .values("city_iata", "city_name", "country_code", "country_name")
+        .distinct()
+        .order_by("country_name", "city_name")
+    ]
+
+
+async def get_direct_destination_countries(home_city):
+    await add_missing_airports(home_city["airports"])
+    return [
+        country
+        async for country in direct_routes_from(home_city)
+        .values("country_code", "country_name")
+        .annotate(city_count=Count("city_iata", distinct=True))
+        .order_by("country_name")
+    ]
+
+
+async def destination_routes_version(home_city, stops):
+    if await find_missing_airports(home_city["airports"]):
+        return None
+    if stops and await find_missing_airports(await connecting_airports(home_city)):
+        return None
+    routes = DirectRoute.objects.all()
+    airports = RouteAirport.objects.all()
+    if not stops:
+        routes = routes.filter(airport_iata__in=home_city["airports"])
+        airports = airports.filter(airport_iata__in=home_city["airports"])
+    version = await routes.aaggregate(routes=Count("id"))
+    refreshed = await airports.aaggregate(refreshed_at=Max("refreshed_at"))
+    return {**version, **refreshed}
+
+
+async def get_one_stop_destination_cities(home_city, country_code=None):
+    added_home_airports = await add_missing_airports(home_city["airports"])
+    added_connecting_airports = await add_missing_airports(
+        await connecting_airports(home_city)
+    )
+    if added_home_airports or added_connecting_airports:
+        route_graph = await sync_to_async(load_route_graph)()
+    else:
+        route_graph = await get_route_graph()
+    cities = route_graph.destination_cities(home_city, stops=1)
+    if country_code is not None:
+        cities = [
+            city for city in cities if city["address"]["countryCode"] == country_code
+        ]
+    return sorted(cities, key=lambda city: city["name"])
+
+
+async def get_one_stop_destination_countries(home_city):
+    city_counts = collections.Counter(
+        (city["address"]["countryName"], city["address"]["countryCode"])
+        for city in await get_one_stop_destination_cities(home_city)
+    )
+    return [
+        {
+            "country_code": country_code,
+            "country_name": country_name,
+            "city_count": city_count,
+        }
+        for (country_name, country_code), city_count in sorted(city_counts.items())
+    ]
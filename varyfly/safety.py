@@ -0,0 +1,109 @@
+import functools
+import math
+import re
+import warnings
+
+import numpy as np
+from django.db.models import Count, Max
+
+from varyfly.models import SafetyArea
+
+SAFETY_RADIUS_KM = 20
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+SAFETY_PERCENTILES = [25, 50, 75, 90]
+
+CITY_AREAS_NOT_MATCHING_CITY_NAMES = [
+    "MARRAKESH",
+    "MALÉ",
+    "VALLETTA",
+    "MINNEAPOLIS",
+    "CASTRIES",
+    "MANAMA",
+    "KOLN",
+    "LEIPZIG",
+    "TEL AVIV",
+    "KLAIPEDA",
+]
+
+
+@functools.lru_cache(maxsize=1024)
+def city_area_matcher(city_name):
+    names = [city_name.upper(), *CITY_AREAS_NOT_MATCHING_CITY_NAMES]
+    return re.compile("|".join(re.escape(name) for name in names))
+
+
+def filter_city_areas(city_name, areas):
+    matcher = city_area_matcher(city_name)
+    return [area for area in areas if matcher.search(area["name"].upper())]
+
+
+def distances_km(latitude, longitude, latitudes, longitudes):
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((latitudes - latitude) / 2) ** 2
+        + math.cos(latitude)
+        * np.cos(latitudes)
+        * np.sin((longitudes - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+async def nearby_safety_areas(city_iata, latitude, longitude, radius=SAFETY_RADIUS_KM):
+    latitude, longitude = float(latitude), float(longitude)
+    latitude_delta = radius / KM_PER_DEGREE
+    longitude_delta = radius / (
+        KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+    )
+    min_latitude, min_longitude = SafetyArea.grid_cell(
+        latitude - latitude_delta, longitude - longitude_delta
+    )
+    max_latitude, max_longitude = SafetyArea.grid_cell(
+        latitude + latitude_delta, longitude + longitude_delta
+    )
+    areas = [
+        area
+        async for area in SafetyArea.objects.filter(
+            city_iata=city_iata,
+            grid_latitude__range=(min_latitude, max_latitude),
+            grid_longitude__range=(min_longitude, max_longitude),
+        ).order_by("id")
+    ]
+    if not areas:
+        return []
+    within_radius = (
+        distances_km(
+            latitude,
+            longitude,
+            np.fromiter((area.latitude for area in areas), float, len(areas)),
+            np.fromiter((area.longitude for area in areas), float, len(areas)),
+        )
+        <= radius
+    )
+    return [area for area, keep in zip(areas, within_radius) if keep]
+
+
+async def safety_areas_version(city_iata):
+    return await SafetyArea.objects.filter(city_iata=city_iata).aaggregate(
+        areas=Count("id"), refreshed_at=Max("refreshed_at")
+    )
+
+
+def safety_score_percentiles(scores):
+    scores = np.array(scores, dtype=float).reshape(-1, len(SafetyArea.SCORES))
+    if not len(scores):
+        return []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        percentiles = np.nanpercentile(scores, SAFETY_PERCENTILES, axis=0)
+    return [
+        {
+            "label": "Median" if percentile == 50 else f"{percentile}th percentile",
+            "scores": {
+                score: None if math.isnan(value) else round(value)
+                for (_, score), value in zip(SafetyArea.SCORES, row)
+            },
+        }
+        for percentile, row in zip(SAFETY_PERCENTILES, percentiles)
+    ]
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import os
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from string import Template
+from urllib.parse import parse_qsl, urlencode
+
+import httpx
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+SAFETY_PAGE_LIMIT = 10
+
+
+def load_fixture(name):
+    with open(FIXTURES_DIR / name) as fixture:
+        return json.load(fixture)
+
+
+def load_template(name):
+    with open(FIXTURES_DIR / name) as fixture:
+        return Template(fixture.read())
+
+
+def matches_keyword(location, keyword):
+    keyword = keyword.upper()
+    return (
+        location["iataCode"] == keyword
+        or location["name"].startswith(keyword)
+        or location["address"]["cityName"].startswith(keyword)
+    )
+
+
+def find_locations(locations, params):
+    sub_types = params.get("subType", "CITY,AIRPORT").split(",")
+    return [
+        location
+        for location in locations
+        if location["subType"] in sub_types
+        and matches_keyword(location, params.get("keyword", ""))
+        and params.get("countryCode", location["address"]["countryCode"])
+        == location["address"]["countryCode"]
+    ]
+
+
+def city_of_airport(locations, airport_iata):
+    return next(
+        (
+            location["address"]["cityCode"]
+            for location in locations
+            if location["subType"] == "AIRPORT" and location["iataCode"] == airport_iata
+        ),
+        airport_iata,
+    )
+
+
+def nearest_city(locations, latitude, longitude):
+    return min(
+        (location for location in locations if location["subType"] == "CITY"),
+        key=lambda city: (city["geoCode"]["latitude"] - latitude) ** 2
+        + (city["geoCode"]["longitude"] - longitude) ** 2,
+    )
+
+
+def standin_app(latency=0.05, error_rate=0.0, rate_limit_rate=0.0, seed=None):
+    rng = random.Random(seed)
+    locations = load_fixture("locations.json")["data"]
+    busiest_period = load_fixture("busiest_period.json")["data"]
+    safety_areas = load_template("safety_rated_locations.json")
+    flight_dates = load_fixture("flight_dates.json")["data"]
+    flight_offers = load_template("flight_offers.json")
+    detailed_names = {
+        location["iataCode"]: location["detailedName"] for location in locations
+    }
+
+    def token(params, url):
+        return {
+            "type": "amadeusOAuth2Token",
+            "access_token": "standin",
+            "token_type": "Bearer",
+            "expires_in": 1799,
+            "state": "approved",
+        }
+
+    def reference_locations(params, url):
+        return {"data": find_locations(locations, params)}
+
+    def reference_cities(params, url):
+        cities = find_locations(locations, {**params, "subType": "CITY"})
+        return {"data": cities[: int(params.get("max", len(cities)))]}
+
+    def direct_destinations(params, url):
+        city_iata = city_of_airport(locations, params["departureAirportCode"])
+        return {
+            "data": [
+                location
+                for location in locations
+                if location["subType"] == "CITY" and location["iataCode"] != city_iata
+            ]
+        }
+
+    def busiest(params, url):
+        year = params["period"]
+        return {
+            "data": [
+                {**period, "period": f"{year}-{period['period'][5:]}"}
+                for period in busiest_period
+            ]
+        }
+
+    def safety_rated_locations(params, url):
+        latitude = float(params["latitude"])
+        longitude = float(params["longitude"])
+        city = nearest_city(locations, latitude, longitude)
+        areas = json.loads(safety_areas.substitute(city=city["name"].title()))["data"]
+        for area in areas:
+            area["geoCode"] = {
+                "latitude": round(latitude + area["geoCode"]["latitude"], 5),
+                "longitude": round(longitude + area["geoCode"]["longitude"], 5),
+            }
+        limit = min(
+            int(params.get("page[limit]", SAFETY_PAGE_LIMIT)), SAFETY_PAGE_LIMIT
+        )
+        offset = int(params.get("page[offset]", 0))
+        links = {"self": f"{url}?{urlencode({**params, 'page[limit]': limit})}"}
+        if offset + limit < len(areas):
+            links["next"] = (
+                f"{url}?"
+                f"{urlencode({**params, 'page[limit]': limit, 'page[offset]': offset + limit})}"
+            )
+        return {
+            "data": areas[offset : offset + limit],
+            "meta": {"count": len(areas), "links": links},
+        }
+
+    def dates(params, url):
+        origin = params["origin"]
+        destination = params["destination"]
+        duration = None if params.get("oneWay") else int(params.get("duration", 7))
+        start = date.today() + timedelta(days=1)
+        data = []
+        for day, flight in enumerate(flight_dates):
+            departure_date = start + timedelta(days=day)
+            offer = {
+                "type": "flight-date",
+                "origin": origin,
+                "destination": destination,
+                "departureDate": departure_date.isoformat(),
+                "price": {"total": flight["price"]},
+            }
+            offer_params = {
+                "originLocationCode": origin,
+                "destinationLocationCode": destination,
+                "departureDate": offer["departureDate"],
+                "adults": 1,
+                "nonStop": params.get("nonStop", "false"),
+            }
+            if duration:
+                offer["returnDate"] = (
+                    departure_date + timedelta(days=duration)
+                ).isoformat()
+                offer_params["returnDate"] = offer["returnDate"]
+            offer["links"] = {
+                "flightOffers": f"{url.replace('/v1/shopping/flight-dates', '/v2/shopping/flight-offers')}?{urlencode(offer_params)}"
+            }
+            data.append(offer)
+        return {
+            "data": data,
+            "dictionaries": {
+                "locations": {
+                    code: {"detailedName": detailed_names.get(code, code)}
+                    for code in (origin, destination)
+                }
+            },
+            "meta": {"currency": "EUR"},
+        }
+
+    def offers(params, url):
+        response = json.loads(
+            flight_offers.safe_substitute(
+                origin=params["originLocationCode"],
+                destination=params["destinationLocationCode"],
+                departureDate=params["departureDate"],
+                returnDate=params.get("returnDate", params["departureDate"]),
+            )
+        )
+        for offer in response["data"]:
+            if not params.get("returnDate"):
+                offer["itineraries"] = offer["itineraries"][:1]
+            if params.get("nonStop") == "true" and any(
+                len(itinerary["segments"]) > 1 for itinerary in offer["itineraries"]
+            ):
+                offer["itineraries"] = []
+        response["data"] = [offer for offer in response["data"] if offer["itineraries"]]
+        return response
+
+    endpoints = {
+        "/v1/security/oauth2/token": token,
+        "/v1/reference-data/locations": reference_locations,
+        "/v1/reference-data/locations/cities": reference_cities,
+        "/v1/airport/direct-destinations": direct_destinations,
+        "/v1/travel/analytics/air-traffic/busiest-period": busiest,
+        "/v1/safety/safety-rated-locations": safety_rated_locations,
+        "/v1/shopping/flight-dates": dates,
+        "/v2/shopping/flight-offers": offers,
+    }
+
+    async def respond(send, status, payload, headers=()):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json"), *headers],
+            }
+        )
+        await send({"type": "http.response.body", "body": json.dumps(payload).encode()})
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        while (await receive()).get("more_body"):
+            pass
+        path = scope["path"]
+        params = dict(parse_qsl(scope["query_string"].decode()))
+        headers = dict(scope["headers"])
+        host = headers.get(b"host", b"localhost").decode()
+        url = f"{scope.get('scheme', 'http')}://{host}{path}"
+        handler = endpoints.get(path)
+        await asyncio.sleep(latency * rng.uniform(0.5, 1.5))
+        if handler is None:
+            await respond(
+                send, 404, {"errors": [{"status": 404, "title": "NOT FOUND"}]}
+            )
+        elif handler is not token and not headers.get(b"authorization"):
+            await respond(
+                send,
+                401,
+                {"errors": [{"status": 401, "title": "Invalid access token"}]},
+            )
+        elif handler is not token and rng.random() < rate_limit_rate:
+            await respond(
+                send,
+                429,
+                {"errors": [{"status": 429, "title": "Too many requests"}]},
+                [(b"retry-after", b"1")],
+            )
+        elif handler is not token and rng.random() < error_rate:
+            await respond(
+                send, 500, {"errors": [{"status": 500, "title": "SYSTEM ERROR"}]}
+            )
+        else:
+            try:
+                await respond(send, 200, handler(params, url))
+            except (KeyError, ValueError) as exc:
+                await respond(
+                    send,
+                    400,
+                    {"errors": [{"status": 400, "title": f"INVALID PARAMETER {exc}"}]},
+                )
+
+    return app
+
+
+application = standin_app(
+    latency=float(os.environ.get("AMADEUS_STANDIN_LATENCY", 0.05)),
+    error_rate=float(os.environ.get("AMADEUS_STANDIN_ERROR_RATE", 0)),
+    rate_limit_rate=float(os.environ.get("AMADEUS_STANDIN_RATE_LIMIT_RATE", 0)),
+)
+
+
+def transport():
+    return httpx.ASGITransport(app=application)
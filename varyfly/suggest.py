@@ -0,0 +1,50 @@
+import bisect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from varyfly.helpers import home_city_choice
+from varyfly.models import Location, normalize_location_name
+
+_city_index = None
+
+
+def build_city_index():
+    entries = []
+    for city in Location.objects.filter(sub_type=Location.CITY).iterator():
+        value, label = home_city_choice(city.as_amadeus_location())
+        entries.append((city.normalized_name, value, label))
+        entries.append((city.iata_code.casefold(), value, label))
+    entries.sort()
+    return [entry[0] for entry in entries], entries
+
+
+def load_city_index():
+    global _city_index
+    _city_index = build_city_index()
+    return _city_index
+
+
+async def get_city_index():
+    if _city_index is None:
+        return await sync_to_async(load_city_index)()
+    return _city_index
+
+
+def suggest_cities(city_index, query):
+    keys, entries = city_index
+    prefix = normalize_location_name(query)
+    suggestions = []
+    if not prefix:
+        return suggestions
+    seen = set()
+    for position in range(bisect.bisect_left(keys, prefix), len(keys)):
+        if not keys[position].startswith(prefix):
+            break
+        _, value, label = entries[position]
+        if value not in seen:
+            seen.add(value)
+            suggestions.append((value, label))
+            if len(suggestions) == settings.CITY_SUGGESTION_LIMIT:
+                break
+    return suggestions
@@ -3,11 +3,16 @@ from django.template.defaultfilters import stringfilter
 
 register = template.Library()
 
+NO_SCORE_COLOUR = (128, 128, 128)
+
 
 @register.filter(is_safe=True)
 @stringfilter
 def get_safety_colour(safety_rating):
-    pct = int(safety_rating) / 100
+    try:
+        pct = int(safety_rating) / 100
+    except ValueError:
+        return NO_SCORE_COLOUR
     pct_diff = 1.0 - pct
     red_color = min(255, int(pct * 2 * 255))
     green_color = min(255, int(pct_diff * 2 * 255))
@@ -18,7 +23,10 @@ def get_safety_colour(safety_rating):
 @register.filter(is_safe=True)
 @stringfilter
 def get_location_score_colour(score):
-    pct = int(score) / 100
+    try:
+        pct = int(score) / 100
+    except ValueError:
+        return NO_SCORE_COLOUR
     pct_diff = 1.0 - pct
     red_color = min(255, int(pct_diff * 2 * 255))
     green_color = min(255, int(pct * 2 * 255))
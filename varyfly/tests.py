@@ -1,3 +1,340 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from varyfly import helpers
+from varyfly.deadline import Deadline
+from varyfly.pricehistory import record_flight_dates, save_pending_prices
+from varyfly.models import FlightDatePrice, Location
+from varyfly.routes import (
+    destination_routes_version,
+    get_one_stop_destination_cities,
+)
+from varyfly.standin.app import standin_app
+from varyfly.traffic import get_traffic_scores, traffic_scores_key
+
+SHORT_DEADLINES = {view_name: 0.3 for view_name in settings.VIEW_DEADLINES}
+HOME_CITY = "London,LON,GB,51.50853,-0.12574,UNITED KINGDOM"
+
+
+def mock_amadeus(handler):
+    async def handle(request):
+        if request.url.path == "/v1/security/oauth2/token":
+            return httpx.Response(
+                200,
+                json={
+                    "access_token": "token",
+                    "token_type": "Bearer",
+                    "expires_in": 1799,
+                },
+            )
+        return await handler(request)
+
+    return httpx.MockTransport(handle)
+
+
+@override_settings(VIEW_DEADLINES=SHORT_DEADLINES)
+@mock.patch.dict("os.environ", {"AMADEUS_BASE_URL": "http://amadeus.standin"})
+class SlowUpstreamTests(TestCase):
+    def setUp(self):
+        helpers._response_cache.clear()
+
+    async def request(self, method, path, data=None, latency=1):
+        helpers.open_client(
+            transport=httpx.ASGITransport(app=standin_app(latency=latency))
+        )
+        try:
+            return await getattr(self.async_client, method)(path, data)
+        finally:
+            await helpers.close_client()
+
+    async def save_home(self):
+        await self.request("post", reverse("save_home"), {"city": HOME_CITY}, 0)
+
+    def assertPartialPage(self, response, destination_iata):
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Partial results")
+        self.assertContains(response, destination_iata)
+
+    async def test_busiest_travel_periods_without_city_details(self):
+        response = await self.request(
+            "get",
+            reverse("busiest_travel_periods"),
+            {"destination_iata": "PAR", "country_code": "FR"},
+        )
+        self.assertPartialPage(response, "PAR")
+        self.assertNotIn("ETag", response.headers)
+
+    async def test_price_calendar_without_city_details(self):
+        await self.save_home()
+        response = await self.request(
+            "get",
+            reverse("price_calendar"),
+            {"destination_iata": "PAR", "country_code": "FR"},
+        )
+        self.assertPartialPage(response, "PAR")
+
+    async def test_cheapest_flight_dates_without_city_details(self):
+        response = await self.request(
+            "get",
+            reverse("cheapest_flight_dates"),
+            {"destination_iata": "PAR", "country_code": "FR"},
+        )
+        self.assertPartialPage(response, "PAR")
+
+    async def test_cheapest_flight_dates_search_without_city_details(self):
+        await self.save_home()
+        response = await self.request(
+            "post",
+            f"{reverse('cheapest_flight_dates')}?destination_iata=PAR&country_code=FR",
+            {"trip_length": "7"},
+        )
+        self.assertPartialPage(response, "PAR")
+
+    async def test_coalesced_request_outlives_the_first_callers_deadline(self):
+        async def slow_upstream(request):
+            read_timeout = request.extensions["timeout"]["read"]
+            if read_timeout is not None and read_timeout < 1:
+                await asyncio.sleep(read_timeout)
+                raise httpx.ReadTimeout("Timed out", request=request)
+            await asyncio.sleep(1)
+            return httpx.Response(200, json={"data": []})
+
+        async def get_locations(budget):
+            with Deadline(budget):
+                return await helpers.amadeus_get(
+                    helpers.amadeus_url("/v1/reference-data/locations"),
+                    params={"keyword": "PAR", "subType": "CITY"},
+                )
+
+        helpers.open_client(transport=mock_amadeus(slow_upstream))
+        try:
+            impatient, patient = await asyncio.gather(
+                get_locations(0.3), get_locations(5), return_exceptions=True
+            )
+        finally:
+            await helpers.close_client()
+        self.assertIsInstance(impatient, asyncio.TimeoutError)
+        self.assertEqual(patient.json(), {"data": []})
+
+
+@mock.patch.dict("os.environ", {"AMADEUS_BASE_URL": "http://amadeus.standin"})
+class TrafficScoresTests(TestCase):
+    def setUp(self):
+        helpers._response_cache.clear()
+
+    async def test_client_errors_are_cached_for_the_failed_year_only(self):
+        requests = []
+
+        async def busiest_period(request):
+            requests.append(request.url.params["period"])
+            if request.url.params["period"] == "2022":
+                return httpx.Response(400, json={"errors": []})
+            return httpx.Response(
+                200,
+                json={
+                    "data": [
+                        {"period": "2023-03", "analytics": {"travelers": {"score": 12}}}
+                    ]
+                },
+            )
+
+        helpers.open_client(transport=mock_amadeus(busiest_period))
+        try:
+            for _ in range(2):
+                scores = await get_traffic_scores(["XXX"], [2022, 2023])
+        finally:
+            await helpers.close_client()
+        self.assertEqual(sorted(requests), ["2022", "2023"])
+        self.assertTrue(np.isnan(scores["XXX"][0]).all())
+        self.assertEqual(scores["XXX"][1][2], 12)
+        self.assertIsNone(await cache.aget(traffic_scores_key("XXX", [2022, 2023])))
+
+
+@mock.patch.dict("os.environ", {"AMADEUS_BASE_URL": "http://amadeus.standin"})
+class UpstreamTimeoutTests(TestCase):
+    def setUp(self):
+        helpers._response_cache.clear()
+
+    async def test_shopping_requests_may_use_the_whole_view_budget(self):
+        timeouts = {}
+
+        async def record_timeout(request):
+            timeouts[request.url.path] = request.extensions["timeout"]["read"]
+            return httpx.Response(200, json={"data": []})
+
+        helpers.open_client(transport=mock_amadeus(record_timeout))
+        try:
+            with Deadline(settings.VIEW_DEADLINES["flight_search"]):
+                for path in [
+                    "/v2/shopping/flight-offers",
+                    "/v1/reference-data/locations",
+                ]:
+                    await helpers.amadeus_get(helpers.amadeus_url(path))
+        finally:
+            await helpers.close_client()
+        self.assertGreaterEqual(
+            timeouts["/v2/shopping/flight-offers"],
+            max(settings.VIEW_DEADLINES.values()),
+        )
+        self.assertEqual(
+            timeouts["/v1/reference-data/locations"], settings.AMADEUS_TIMEOUT
+        )
+
+    async def test_flight_search_flags_an_upstream_timeout_as_partial(self):
+        async def time_out(request):
+            raise httpx.ReadTimeout("Timed out", request=request)
+
+        helpers.open_client(transport=mock_amadeus(time_out))
+        try:
+            response = await self.async_client.get(
+                reverse("flight_search"),
+                {
+                    "originLocationCode": "LON",
+                    "destinationLocationCode": "PAR",
+                    "departureDate": "2026-12-01",
+                    "adults": "1",
+                },
+            )
+        finally:
+            await helpers.close_client()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Partial results")
+
+
+def city(iata_code, name, country_code, country_name):
+    return {
+        "type": "location",
+        "subType": "city",
+        "name": name,
+        "iataCode": iata_code,
+        "address": {"countryCode": country_code, "countryName": country_name},
+    }
+
+
+@mock.patch.dict("os.environ", {"AMADEUS_BASE_URL": "http://amadeus.standin"})
+class OneStopRoutesTests(TestCase):
+    def setUp(self):
+        helpers._response_cache.clear()
+        for iata_code, city_code in [("LHR", "LON"), ("CDG", "PAR"), ("LIS", "LIS")]:
+            Location.objects.create(
+                sub_type=Location.AIRPORT,
+                iata_code=iata_code,
+                name=iata_code,
+                normalized_name=iata_code,
+                city_code=city_code,
+                city_name=city_code,
+                country_code="XX",
+                country_name="XX",
+            )
+
+    async def test_airports_without_routes_are_fetched_once(self):
+        requests = []
+        routes = {
+            "LHR": [
+                city("PAR", "PARIS", "FR", "FRANCE"),
+                city("LIS", "LISBON", "PT", "PORTUGAL"),
+            ],
+            "LIS": [],
+        }
+
+        async def direct_destinations(request):
+            airport_iata = request.url.params["departureAirportCode"]
+            requests.append(airport_iata)
+            if airport_iata not in routes:
+                return httpx.Response(400, json={"errors": []})
+            return httpx.Response(200, json={"data": routes[airport_iata]})
+
+        home_city = {"iata": "LON", "airports": ["LHR"]}
+        helpers.open_client(transport=mock_amadeus(direct_destinations))
+        try:
+            for _ in range(2):
+                await get_one_stop_destination_cities(home_city)
+            version = await destination_routes_version(home_city, stops=1)
+        finally:
+            await helpers.close_client()
+        self.assertEqual(sorted(requests), ["CDG", "LHR", "LIS"])
+        self.assertEqual(version["routes"], 2)
+
+
+@mock.patch.dict("os.environ", {"AMADEUS_BASE_URL": "http://amadeus.standin"})
+class PriceCalendarTests(TestCase):
+    async def test_partial_calendar_keeps_finished_columns(self):
+        async def flight_dates(request):
+            trip_length = request.url.params.get("duration", "One way")
+            if trip_length == "1":
+                await asyncio.sleep(10)
+            if trip_length == "2":
+                return httpx.Response(500, json={"errors": []})
+            return httpx.Response(
+                200,
+                json={
+                    "meta": {"currency": "EUR"},
+                    "data": [
+                        {
+                            "departureDate": "2026-12-01",
+                            "price": {"total": trip_length.replace("One way", "99")},
+                            "links": {"flightOffers": "https://x/?origin=LON"},
+                        }
+                    ],
+                },
+            )
+
+        helpers.open_client(transport=mock_amadeus(flight_dates))
+        try:
+            with Deadline(2) as deadline:
+                calendar = await helpers.get_price_calendar("LON", "PAR", False)
+        finally:
+            await helpers.close_client()
+        prices = [cell and cell["price"] for cell in calendar["rows"][0]["cells"]]
+        self.assertEqual(prices[:3], [None, None, 3.0])
+        self.assertEqual(prices[-1], 99.0)
+        self.assertTrue(deadline.partial)
+        self.assertIsNone(
+            await cache.aget(helpers.price_calendar_key("LON", "PAR", False))
+        )
+        await asyncio.sleep(0.1)
+        self.assertEqual(helpers._in_flight_requests, {})
+
+
+class PriceHistoryTests(TestCase):
+    async def test_pending_prices_are_saved_without_the_event_loop(self):
+        record_flight_dates(
+            False,
+            "7",
+            {
+                "meta": {"currency": "EUR"},
+                "data": [
+                    {
+                        "origin": "LON",
+                        "destination": "PAR",
+                        "departureDate": "2026-12-01",
+                        "price": {"total": "80.00"},
+                    }
+                ],
+            },
+        )
+        await sync_to_async(save_pending_prices)()
+        self.assertEqual(await FlightDatePrice.objects.acount(), 1)
+
+
+@mock.patch.dict("os.environ", {"AMADEUS_BASE_URL": "http://amadeus.standin"})
+class QuietestMonthTests(TestCase):
+    async def test_default_month_is_selected_in_the_form(self):
+        helpers.open_client(transport=httpx.ASGITransport(app=standin_app(latency=0)))
+        try:
+            await self.async_client.post(reverse("save_home"), {"city": HOME_CITY})
+            with mock.patch("varyfly.views.datetime") as fake_datetime:
+                fake_datetime.now.return_value.month = 12
+                response = await self.async_client.get(reverse("quietest_month"))
+        finally:
+            await helpers.close_client()
+        self.assertContains(response, "in January")
+        self.assertContains(response, '<option value="0" selected>January</option>')
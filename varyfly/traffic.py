@@ -0,0 +1,138 @@
+import asyncio
+import calendar
+import logging
+import warnings
+from datetime import date
+
+import httpx
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from varyfly.deadline import mark_partial, remaining_time
+from varyfly.helpers import get_busiest_travel_periods
+
+MONTHS = 12
+MONTH_NAMES = calendar.month_name[1:]
+
+
+def past_years(count, today=None):
+    year = (today or date.today()).year
+    return list(range(year - count, year))
+
+
+def monthly_scores(periods):
+    scores = np.full(MONTHS, np.nan, dtype=np.float32)
+    for period in periods:
+        scores[int(period["period"][5:7]) - 1] = period["analytics"]["travelers"][
+            "score"
+        ]
+    return scores
+
+
+def chart_values(scores):
+    return [None if np.isnan(score) else round(float(score), 2) for score in scores]
+
+
+def traffic_scores_key(city_iata, years):
+    return f"traffic_scores:{city_iata}:{years[0]}-{years[-1]}"
+
+
+def missing_traffic_key(city_iata, year):
+    return f"traffic_scores_missing:{city_iata}:{year}"
+
+
+async def fetch_year_periods(city_iata, year):
+    key = missing_traffic_key(city_iata, year)
+    if await cache.aget(key):
+        return None
+    try:
+        return await get_busiest_travel_periods(city_iata, year)
+    except httpx.HTTPStatusError as exc:
+        if exc.response.status_code >= 500 or exc.response.status_code == 429:
+            raise
+        logging.warning(
+            f"No traffic for {city_iata} in {year}: error response {exc.response.status_code} while requesting {exc.request.url}"
+        )
+        await cache.aset(key, True, settings.TRAFFIC_SCORES_MISSING_TTL)
+        return None
+
+
+async def fetch_traffic_scores(city_iata, years):
+    periods = await asyncio.gather(
+        *(fetch_year_periods(city_iata, year) for year in years)
+    )
+    scores = np.stack([monthly_scores(year_periods or []) for year_periods in periods])
+    return scores, None not in periods
+
+
+async def get_traffic_scores(city_codes, years):
+    keys = {city_iata: traffic_scores_key(city_iata, years) for city_iata in city_codes}
+    cached = await cache.aget_many(keys.values())
+    scores = {
+        city_iata: np.frombuffer(cached[key], dtype=np.float32).reshape(
+            len(years), MONTHS
+        )
+        for city_iata, key in keys.items()
+        if key in cached
+    }
+    missing = [city_iata for city_iata in city_codes if city_iata not in scores]
+    if not missing:
+        return scores
+    semaphore = asyncio.Semaphore(settings.TRAFFIC_SCORES_CONCURRENCY)
+
+    async def fetch(city_iata):
+        async with semaphore:
+            return await fetch_traffic_scores(city_iata, years)
+
+    tasks = {
+        city_iata: asyncio.ensure_future(fetch(city_iata)) for city_iata in missing
+    }
+    try:
+        done, pending = await asyncio.wait(tasks.values(), timeout=remaining_time())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    if pending:
+        mark_partial()
+    fetched = {}
+    complete = []
+    for city_iata, task in tasks.items():
+        if task not in done:
+            continue
+        exc = task.exception()
+        if isinstance(exc, httpx.HTTPStatusError):
+            logging.warning(
+                f"Skipping {city_iata} after error response {exc.response.status_code} while requesting {exc.request.url}"
+            )
+        elif isinstance(exc, httpx.RequestError):
+            logging.warning(
+                f"Skipping {city_iata} after an error requesting {exc.request.url}."
+            )
+        elif isinstance(exc, (asyncio.TimeoutError, KeyError, ValueError)):
+            logging.warning(f"Skipping {city_iata} without traffic scores: {exc!r}")
+        elif exc is not None:
+            raise exc
+        else:
+            fetched[city_iata], city_complete = task.result()
+            if city_complete:
+                complete.append(city_iata)
+    await cache.aset_many(
+        {keys[city_iata]: fetched[city_iata].tobytes() for city_iata in complete},
+        settings.TRAFFIC_SCORES_TTL,
+    )
+    return {**scores, **fetched}
+
+
+def average_monthly_scores(scores):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(scores, axis=-2)
+
+
+def rank_quietest_months(scores):
+    scores = average_monthly_scores(scores)
+    busyness = np.where(np.isnan(scores), np.inf, scores)
+    month_ranks = busyness.argsort(axis=0, kind="stable").argsort(axis=0) + 1
+    quietest_months = busyness.argmin(axis=1)
+    return scores, month_ranks, quietest_months
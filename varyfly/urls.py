@@ -9,6 +9,11 @@ urlpatterns = [
         views.destinations,
         name="destinations",
     ),
+    path(
+        "destinations/country/",
+        views.destinations_country,
+        name="destinations_country",
+    ),
     path(
         "safety/",
         views.safety,
@@ -19,14 +24,40 @@ urlpatterns = [
         views.cheapest_flight_dates,
         name="cheapest_flight_dates",
     ),
+    path(
+        "price-calendar/",
+        views.price_calendar,
+        name="price_calendar",
+    ),
+    path(
+        "price-trend/",
+        views.price_trend,
+        name="price_trend",
+    ),
     path(
         "busiest-travel-periods/",
         views.busiest_travel_periods,
         name="busiest_travel_periods",
     ),
+    path(
+        "quietest-month/",
+        views.quietest_month,
+        name="quietest_month",
+    ),
     path(
         "flight-search/",
         views.flight_search,
         name="flight_search",
     ),
+    path(
+        "cheapest-everywhere/",
+        views.cheapest_everywhere,
+        name="cheapest_everywhere",
+    ),
+    path("metrics", views.metrics, name="metrics"),
+    path(
+        "api/cities/suggest",
+        views.city_suggestions,
+        name="city_suggestions",
+    ),
 ]
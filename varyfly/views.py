@@ -1,22 +1,81 @@
 import asyncio
 import logging
-import os
 from datetime import datetime
 
 import httpx
-from asgiref.sync import sync_to_async
-from django.http import HttpResponseRedirect
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.http import (
+    HttpResponse,
+    HttpResponseNotFound,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.middleware.csrf import get_token
 from django.shortcuts import render
+from django.template.loader import render_to_string
 
-from varyfly.forms import HomeSearchForm, HomeResultsForm, TravelPreferencesForm
+from varyfly.conditional import add_page_headers, conditional_response, make_etag
+from varyfly.deadline import current_deadline, with_deadline, within_deadline
+from varyfly.forms import (
+    FlightOffersFilterForm,
+    HomeSearchForm,
+    HomeResultsForm,
+    PriceCalendarForm,
+    QuietestMonthForm,
+    TrafficYearsForm,
+    TravelPreferencesForm,
+)
 from varyfly.helpers import (
     get_home_city,
-    get_destination_cities_for_airport,
-    access_token_and_type,
     get_city_details,
+    save_home_city,
     save_travel_preferences,
     get_travel_preferences,
     add_precise_city_lat_long,
+    get_city_airports,
+    get_safety_rated_locations,
+    search_cities,
+    home_city_choice,
+    get_flight_dates,
+    get_flight_offers,
+    get_price_calendar,
+    add_readable_flight_dates,
+    sweep_cheapest_flights,
+    response_cache_stats,
+    coalescing_stats,
+)
+from varyfly.metrics import Counter, Gauge, prometheus_text
+from varyfly.models import Location, SafetyArea, SafetyCity
+from varyfly.offers import sort_and_filter_flight_offers
+from varyfly.pricehistory import (
+    TREND_LABEL_FORMATS,
+    get_price_trend,
+    trip_length_duration,
+)
+from varyfly.postgresql import pool_stats
+from varyfly.routes import (
+    destination_routes_version,
+    get_direct_destination_cities,
+    get_direct_destination_countries,
+    get_one_stop_destination_cities,
+    get_one_stop_destination_countries,
+)
+from varyfly.safety import (
+    filter_city_areas,
+    nearby_safety_areas,
+    safety_areas_version,
+    safety_score_percentiles,
+)
+from varyfly.suggest import get_city_index, suggest_cities
+from varyfly.traffic import (
+    MONTH_NAMES,
+    chart_values,
+    get_traffic_scores,
+    past_years,
+    rank_quietest_months,
 )
 
 
@@ -30,30 +89,17 @@ async def save_home(request):
         city_latitude = city_details[3]
         city_longitude = city_details[4]
         city_country_name = city_details[5]
-        async with httpx.AsyncClient() as client:
-            try:
-                token_type, access_token = await access_token_and_type(client)
-                response = await client.get(
-                    f"https://{os.environ.get('AMADEUS_BASE_URL')}/v1/reference-data/locations",
-                    params={
-                        "subType": "AIRPORT",
-                        "keyword": city_name,
-                        "countryCode": city_country_code,
-                    },
-                    headers={"Authorization": f"{token_type} {access_token}"},
-                )
-                response.raise_for_status()
-                airports = [
-                    airport["iataCode"]
-                    for airport in response.json().get("data", [])
-                    if airport["address"]["cityCode"] == city_iata
-                ]
-            except httpx.RequestError as exc:
-                logging.error(f"An error occurred while requesting {exc.request.url}.")
-            except httpx.HTTPStatusError as exc:
-                logging.error(
-                    f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
-                )
+        airports = []
+        try:
+            airports = await get_city_airports(city_name, city_iata, city_country_code)
+        except httpx.RequestError as exc:
+            logging.error(f"An error occurred while requesting {exc.request.url}.")
+        except httpx.HTTPStatusError as exc:
+            logging.error(
+                f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+            )
+        except asyncio.TimeoutError:
+            pass
         home_city = {
             "iata": city_iata,
             "name": city_name,
@@ -63,99 +109,183 @@ async def save_home(request):
             "country_name": city_country_name,
             "airports": airports,
         }
-        request.session["home_city"] = home_city
+        await save_home_city(request, home_city)
     return HttpResponseRedirect("/")
 
 
+def unknown_city(city_iata, country_code):
+    return {"name": city_iata, "address": {"countryName": country_code}}
+
+
+@with_deadline("busiest_travel_periods")
 async def busiest_travel_periods(request):
     destination_iata = request.GET.get("destination_iata")
     country_code = request.GET.get("country_code")
-    now = datetime.now()
-    previous_year = now.year - 1
-    async with httpx.AsyncClient() as client:
-        try:
-            token_type, access_token = await access_token_and_type(client)
-            city = await get_city_details(
-                destination_iata, country_code, client, token_type, access_token
-            )
-            response = await client.get(
-                f"https://{os.environ.get('AMADEUS_BASE_URL')}/v1/travel/analytics/air-traffic/busiest-period",
-                params={"cityCode": destination_iata, "period": previous_year},
-                headers={"Authorization": f"{token_type} {access_token}"},
-            )
-            response.raise_for_status()
-            response = response.json()
-            monthly_traffic_percentages = response.get("data", [])
-            for monthly_traffic in monthly_traffic_percentages:
-                monthly_traffic["period"] = datetime.strptime(
-                    monthly_traffic["period"], "%Y-%m"
-                )
-                monthly_traffic["month_label"] = monthly_traffic["period"].strftime(
-                    "%B"
-                )
-                monthly_traffic["percentage"] = monthly_traffic["analytics"][
-                    "travelers"
-                ]["score"]
-            monthly_traffic_percentages = sorted(
-                monthly_traffic_percentages,
-                key=lambda traffic: traffic["period"],
-            )
-        except httpx.RequestError as exc:
-            logging.error(f"An error occurred while requesting {exc.request.url}.")
-        except httpx.HTTPStatusError as exc:
-            logging.error(
-                f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+    form = TrafficYearsForm(request.GET)
+    years = past_years(form.cleaned_data["years"] if form.is_valid() else 1)
+    yearly_traffic = []
+    etag = None
+    city = unknown_city(destination_iata, country_code)
+    try:
+        city = await get_city_details(destination_iata, country_code)
+        scores = await get_traffic_scores([destination_iata], years)
+        if destination_iata in scores:
+            yearly_traffic = [
+                {"year": year, "scores": chart_values(year_scores)}
+                for year, year_scores in zip(years, scores[destination_iata])
+            ]
+            etag = make_etag(
+                "busiest_travel_periods",
+                destination_iata,
+                country_code,
+                city["name"],
+                city["address"]["countryName"],
+                years,
+                scores[destination_iata].tobytes(),
             )
-    return render(
+    except httpx.RequestError as exc:
+        logging.error(f"An error occurred while requesting {exc.request.url}.")
+    except httpx.HTTPStatusError as exc:
+        logging.error(
+            f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+        )
+    except asyncio.TimeoutError:
+        pass
+    if current_deadline().partial:
+        etag = None
+    response = conditional_response(request, "busiest_travel_periods", etag)
+    if response is not None:
+        return response
+    response = render(
         request,
         "busiest_travel_periods.html",
         {
+            "form": form,
+            "partial": current_deadline().partial,
+            "destination_iata": destination_iata,
+            "country_code": country_code,
             "destination_city": city["name"],
             "destination_country": city["address"]["countryName"],
-            "year": previous_year,
-            "monthly_traffic_percentages": monthly_traffic_percentages,
+            "years": years,
+            "month_labels": MONTH_NAMES,
+            "yearly_traffic": yearly_traffic,
         },
     )
+    return add_page_headers(response, "busiest_travel_periods", etag)
 
 
-async def flight_search(request):
-    async with httpx.AsyncClient() as client:
-        try:
-            token_type, access_token = await access_token_and_type(client)
-            params = {
-                "originLocationCode": request.GET.get("originLocationCode"),
-                "destinationLocationCode": request.GET.get("destinationLocationCode"),
-                "departureDate": request.GET.get("departureDate"),
-                "returnDate": request.GET.get("returnDate"),
-                "adults": request.GET.get("adults"),
-                "nonStop": request.GET.get("nonStop"),
+@with_deadline("quietest_month")
+async def quietest_month(request):
+    home_city = await get_home_city(request)
+    if not home_city:
+        return render(
+            request,
+            "no_home_saved.html",
+        )
+    # Without a chosen month, rank destinations for next month: month_name
+    # indexes in the form are 0-based, so this month's number is next month's.
+    next_month = datetime.now().month % 12
+    data = request.GET.copy()
+    if not data.get("month"):
+        data["month"] = str(next_month)
+    form = QuietestMonthForm(data)
+    filters = form.cleaned_data if form.is_valid() else {}
+    years = past_years(filters.get("years") or 1)
+    month = filters.get("month")
+    if month is None:
+        month = next_month
+    cities = []
+    scores = {}
+    try:
+        cities = await get_direct_destination_cities(home_city)
+        scores = await get_traffic_scores([city["iataCode"] for city in cities], years)
+    except httpx.RequestError as exc:
+        logging.error(f"An error occurred while requesting {exc.request.url}.")
+    except httpx.HTTPStatusError as exc:
+        logging.error(
+            f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+        )
+    except asyncio.TimeoutError:
+        pass
+    cities = [city for city in cities if city["iataCode"] in scores]
+    rankings = []
+    if cities:
+        month_scores, month_ranks, quietest_months = rank_quietest_months(
+            np.stack([scores[city["iataCode"]] for city in cities])
+        )
+        order = month_ranks[:, month].argsort()
+        rankings = [
+            {
+                "city": cities[index],
+                "rank": month_ranks[index, month],
+                "score": month_scores[index, month],
+                "quietest_month": MONTH_NAMES[quietest_months[index]],
             }
-            response = await client.get(
-                f"https://{os.environ.get('AMADEUS_BASE_URL')}/v2/shopping/flight-offers",
-                params=params,
-                headers={"Authorization": f"{token_type} {access_token}"},
-                timeout=None,
-            )
-            response.raise_for_status()
-            response = response.json()
-            logging.info(response)
-        except httpx.RequestError as exc:
-            logging.error(f"An error occurred while requesting {exc.request.url}.")
-        except httpx.HTTPStatusError as exc:
-            logging.error(
-                f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
-            )
+            for index in order
+            if not np.isnan(month_scores[index, month])
+        ]
+    return render(
+        request,
+        "quietest_month.html",
+        {
+            "form": form,
+            "home_city": home_city,
+            "month": MONTH_NAMES[month],
+            "years": years,
+            "rankings": rankings,
+            "partial": current_deadline().partial,
+        },
+    )
+
+
+FLIGHT_SEARCH_PARAMS = (
+    "originLocationCode",
+    "destinationLocationCode",
+    "departureDate",
+    "returnDate",
+    "adults",
+    "nonStop",
+)
+
+
+@with_deadline("flight_search")
+async def flight_search(request):
+    search = {name: request.GET.get(name, "") for name in FLIGHT_SEARCH_PARAMS}
+    form = FlightOffersFilterForm(request.GET)
+    offers = []
+    try:
+        offers = await get_flight_offers(*search.values())
+    except httpx.RequestError as exc:
+        logging.error(f"An error occurred while requesting {exc.request.url}.")
+    except httpx.HTTPStatusError as exc:
+        logging.error(
+            f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+        )
+    except asyncio.TimeoutError:
+        pass
+    if form.is_valid():
+        filters = {
+            name: value for name, value in form.cleaned_data.items() if value != ""
+        }
+        filters["sort"] = filters.get("sort") or "price"
+        offers = sort_and_filter_flight_offers(offers, **filters)
     return render(
         request,
         "flight_search.html",
-        {},
+        {
+            "form": form,
+            "search": search,
+            "offers": offers,
+            "partial": current_deadline().partial,
+        },
     )
 
 
+@with_deadline("cheapest_flight_dates")
 async def cheapest_flight_dates(request):
     destination_iata = request.GET.get("destination_iata")
     country_code = request.GET.get("country_code")
-    saved_travel_preferences = await sync_to_async(get_travel_preferences)(request)
+    saved_travel_preferences = await get_travel_preferences(request)
     if saved_travel_preferences:
         form = TravelPreferencesForm(initial=saved_travel_preferences)
     else:
@@ -163,86 +293,54 @@ async def cheapest_flight_dates(request):
     if request.method == "POST":
         form = TravelPreferencesForm(request.POST)
         if form.is_valid():
-            await sync_to_async(save_travel_preferences)(request, form.cleaned_data)
-            home_city = await sync_to_async(get_home_city)(request)
+            await save_travel_preferences(request, form.cleaned_data)
+            home_city = await get_home_city(request)
             origin_iata = home_city["iata"]
-            async with httpx.AsyncClient() as client:
-                try:
-                    token_type, access_token = await access_token_and_type(client)
-                    city = await get_city_details(
-                        destination_iata, country_code, client, token_type, access_token
-                    )
-                    params = {
-                        "origin": origin_iata,
-                        "destination": destination_iata,
-                        "nonStop": form.cleaned_data["nonstop_only"],
-                    }
-                    if form.cleaned_data["trip_length"] in [
-                        f"{i}" for i in range(1, 16)
-                    ]:
-                        params["duration"] = form.cleaned_data["trip_length"]
-                    else:
-                        params["oneWay"] = True
-                    response = await client.get(
-                        f"https://{os.environ.get('AMADEUS_BASE_URL')}/v1/shopping/flight-dates",
-                        params=params,
-                        headers={"Authorization": f"{token_type} {access_token}"},
-                        timeout=None,
-                    )
-                    response.raise_for_status()
-                    response = response.json()
-                    flights = response.get("data", [])
-                    currency = response.get("meta", {}).get("currency")
-                    airports = response["dictionaries"]["locations"]
-                    for flight in flights:
-                        flight[
-                            "readable_origin"
-                        ] = f"{airports[flight['origin']]['detailedName']} ({flight['origin']})"
-                        flight[
-                            "readable_destination"
-                        ] = f"{airports[flight['destination']]['detailedName']} ({flight['destination']})"
-                        departure_date = datetime.strptime(
-                            flight["departureDate"], "%Y-%m-%d"
-                        )
-                        flight["readable_departure"] = departure_date.strftime(
-                            "%a %d %b %Y"
-                        )
-                        flight["offers_querystring"] = flight["links"][
-                            "flightOffers"
-                        ].split("?")[1]
-                        if flight.get("returnDate"):
-                            return_date = datetime.strptime(
-                                flight["returnDate"], "%Y-%m-%d"
-                            )
-                            flight["readable_return"] = return_date.strftime(
-                                "%a %d %b %Y"
-                            )
-                except httpx.RequestError as exc:
-                    logging.error(
-                        f"An error occurred while requesting {exc.request.url}."
-                    )
-                    return render(
-                        request,
-                        "no_flight_dates_found.html",
-                        {
-                            "form": form,
-                            "destination_city": city["name"],
-                            "destination_country": city["address"]["countryName"],
-                        },
-                    )
-                except httpx.HTTPStatusError as exc:
-                    logging.error(
-                        f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
-                    )
-                    return render(
-                        request,
-                        "no_flight_dates_found.html",
-                        {
-                            "form": form,
-                            "destination_city": city["name"],
-                            "destination_country": city["address"]["countryName"],
-                        },
-                    )
+            city = unknown_city(destination_iata, country_code)
+            try:
+                city = await get_city_details(destination_iata, country_code)
+                response = await get_flight_dates(
+                    origin_iata,
+                    destination_iata,
+                    form.cleaned_data["nonstop_only"],
+                    form.cleaned_data["trip_length"],
+                )
+                flights, currency = add_readable_flight_dates(response)
+            except httpx.RequestError as exc:
+                logging.error(f"An error occurred while requesting {exc.request.url}.")
+                return render(
+                    request,
+                    "no_flight_dates_found.html",
+                    {
+                        "form": form,
+                        "destination_city": city["name"],
+                        "destination_country": city["address"]["countryName"],
+                    },
+                )
+            except httpx.HTTPStatusError as exc:
+                logging.error(
+                    f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+                )
+                return render(
+                    request,
+                    "no_flight_dates_found.html",
+                    {
+                        "form": form,
+                        "destination_city": city["name"],
+                        "destination_country": city["address"]["countryName"],
+                    },
+                )
+            except asyncio.TimeoutError:
+                return render(
+                    request,
+                    "no_flight_dates_found.html",
+                    {
+                        "form": form,
+                        "destination_city": city["name"],
+                        "destination_country": city["address"]["countryName"],
+                        "partial": True,
+                    },
+                )
             return render(
                 request,
                 "cheapest_flight_dates.html"
@@ -257,195 +355,344 @@ async def cheapest_flight_dates(request):
                 },
             )
 
-    async with httpx.AsyncClient() as client:
-        try:
-            token_type, access_token = await access_token_and_type(client)
-            city = await get_city_details(
-                destination_iata, country_code, client, token_type, access_token
-            )
-        except httpx.RequestError as exc:
-            logging.error(f"An error occurred while requesting {exc.request.url}.")
-        except httpx.HTTPStatusError as exc:
-            logging.error(
-                f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
-            )
+    city = unknown_city(destination_iata, country_code)
+    try:
+        city = await get_city_details(destination_iata, country_code)
+    except httpx.RequestError as exc:
+        logging.error(f"An error occurred while requesting {exc.request.url}.")
+    except httpx.HTTPStatusError as exc:
+        logging.error(
+            f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+        )
+    except asyncio.TimeoutError:
+        pass
     return render(
         request,
         "cheapest_flight_dates.html",
         {
             "form": form,
+            "partial": current_deadline().partial,
+            "destination_city": city["name"],
+            "destination_country": city["address"]["countryName"],
+        },
+    )
+
+
+@with_deadline("price_calendar")
+async def price_calendar(request):
+    home_city = await get_home_city(request)
+    if not home_city:
+        return render(
+            request,
+            "no_home_saved.html",
+        )
+    destination_iata = request.GET.get("destination_iata")
+    country_code = request.GET.get("country_code")
+    if "search" in request.GET:
+        form = PriceCalendarForm(request.GET)
+    else:
+        travel_preferences = await get_travel_preferences(request)
+        form = PriceCalendarForm(
+            {"nonstop_only": travel_preferences.get("nonstop_only", False)}
+        )
+    nonstop = form.cleaned_data["nonstop_only"] if form.is_valid() else False
+    calendar = {}
+    city = unknown_city(destination_iata, country_code)
+    try:
+        city = await get_city_details(destination_iata, country_code)
+        calendar = await get_price_calendar(
+            home_city["iata"], destination_iata, nonstop
+        )
+    except httpx.RequestError as exc:
+        logging.error(f"An error occurred while requesting {exc.request.url}.")
+    except httpx.HTTPStatusError as exc:
+        logging.error(
+            f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+        )
+    except asyncio.TimeoutError:
+        pass
+    return render(
+        request,
+        "price_calendar.html",
+        {
+            "form": form,
+            "partial": current_deadline().partial,
+            "destination_iata": destination_iata,
+            "country_code": country_code,
             "destination_city": city["name"],
             "destination_country": city["address"]["countryName"],
+            "trip_lengths": [
+                label
+                for _, label in TravelPreferencesForm.base_fields["trip_length"].choices
+            ],
+            "currency": calendar.get("currency", ""),
+            "rows": calendar.get("rows", []),
+        },
+    )
+
+
+async def price_trend(request):
+    home_city = await get_home_city(request)
+    if not home_city:
+        return render(
+            request,
+            "no_home_saved.html",
+        )
+    destination_iata = request.GET.get("destination_iata")
+    country_code = request.GET.get("country_code")
+    if "trip_length" in request.GET:
+        form = TravelPreferencesForm(request.GET)
+    else:
+        form = TravelPreferencesForm(
+            {"trip_length": "7", **await get_travel_preferences(request)}
+        )
+    travel_preferences = (
+        form.cleaned_data
+        if form.is_valid()
+        else {"nonstop_only": False, "trip_length": "7"}
+    )
+    resolution, trend = await get_price_trend(
+        home_city["iata"],
+        destination_iata,
+        travel_preferences["nonstop_only"],
+        trip_length_duration(travel_preferences["trip_length"]),
+    )
+    city = (
+        await Location.objects.filter(
+            sub_type=Location.CITY, iata_code=destination_iata
+        )
+        .values("name", "country_name")
+        .afirst()
+    ) or {"name": destination_iata, "country_name": country_code}
+    return render(
+        request,
+        "price_trend.html",
+        {
+            "form": form,
+            "destination_iata": destination_iata,
+            "country_code": country_code,
+            "destination_city": city["name"],
+            "destination_country": city["country_name"],
+            "resolution": resolution,
+            "label_format": TREND_LABEL_FORMATS.get(resolution, ""),
+            "trend": trend,
+            "currency": trend[-1]["currency"] if trend else "",
         },
     )
 
 
+@with_deadline("safety")
 async def safety(request):
-    async with httpx.AsyncClient() as client:
+    city_iata = request.GET.get("city_iata")
+    country_code = request.GET.get("country_code")
+    etag = last_modified = None
+    stored_city = await SafetyCity.objects.filter(city_iata=city_iata).afirst()
+    if stored_city is not None:
+        version = await safety_areas_version(city_iata)
+        last_modified = max(
+            stored_city.refreshed_at,
+            version["refreshed_at"] or stored_city.refreshed_at,
+        )
+        etag = make_etag(
+            "safety",
+            city_iata,
+            country_code,
+            stored_city.as_amadeus_city(),
+            version["areas"],
+            last_modified,
+        )
+    response = conditional_response(request, "safety", etag, last_modified)
+    if response is not None:
+        return response
+
+    async def stream_safety():
+        yield render_to_string("page_start.html", {}, request)
+        city = None
+        areas = []
+        scores = []
         try:
-            token_type, access_token = await access_token_and_type(client)
-            city_iata = request.GET.get("city_iata")
-            country_code = request.GET.get("country_code")
-            city = await get_city_details(
-                city_iata, country_code, client, token_type, access_token
-            )
-            city = await add_precise_city_lat_long(
-                city, country_code, client, token_type, access_token
-            )
-            response = await client.get(
-                f"https://{os.environ.get('AMADEUS_BASE_URL')}/v1/safety/safety-rated-locations",
-                params={
-                    "latitude": city["geoCode"]["latitude"],
-                    "longitude": city["geoCode"]["longitude"],
-                    "radius": 20,
-                    "page[limit]": 10000,
-                },
-                headers={"Authorization": f"{token_type} {access_token}"},
+            if stored_city is not None:
+                city = stored_city.as_amadeus_city()
+            else:
+                city = await get_city_details(city_iata, country_code)
+                city = await add_precise_city_lat_long(city, country_code)
+            stored_areas = await nearby_safety_areas(
+                city_iata, city["geoCode"]["latitude"], city["geoCode"]["longitude"]
             )
-            response.raise_for_status()
-            areas = response.json().get("data", [])
-            links = response.json().get("meta", {}).get("links", {})
-            while links.get("next"):
-                response = await client.get(
-                    links.get("next"),
-                    headers={"Authorization": f"{token_type} {access_token}"},
-                )
-                areas = areas + response.json().get("data", [])
-                links = response.json().get("meta", {}).get("links", {})
-            city_areas_not_matching_city_names = [
-                "MARRAKESH",
-                "MALÉ",
-                "VALLETTA",
-                "MINNEAPOLIS",
-                "CASTRIES",
-                "MANAMA",
-                "KOLN",
-                "LEIPZIG",
-                "TEL AVIV",
-                "KLAIPEDA",
-            ]
-            areas = [
-                area
-                for area in areas
-                if city["name"].upper() in area["name"].upper()
-                or any(
-                    name in area["name"].upper()
-                    for name in city_areas_not_matching_city_names
+            if stored_city is not None or stored_areas:
+                areas = [area.as_amadeus_area() for area in stored_areas]
+                scores = [
+                    [getattr(area, field) for field, _ in SafetyArea.SCORES]
+                    for area in stored_areas
+                ]
+            else:
+                areas = await within_deadline(
+                    get_safety_rated_locations(
+                        city["geoCode"]["latitude"], city["geoCode"]["longitude"]
+                    )
                 )
-            ]
+                areas = filter_city_areas(city["name"], areas)
+                scores = [
+                    [area["safetyScores"].get(score) for _, score in SafetyArea.SCORES]
+                    for area in areas
+                ]
         except httpx.RequestError as exc:
             logging.error(f"An error occurred while requesting {exc.request.url}.")
         except httpx.HTTPStatusError as exc:
             logging.error(
                 f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
             )
-    return render(
-        request,
-        "safety.html",
-        {
-            "areas": areas,
-            "destination_city": city["name"],
-            "destination_country": city["address"]["countryName"],
-        },
+        except asyncio.TimeoutError:
+            pass
+        yield render_to_string(
+            "safety_summary.html",
+            {
+                "partial": deadline.partial,
+                "percentiles": safety_score_percentiles(scores),
+                "destination_city": city["name"] if city else "",
+                "destination_country": city["address"]["countryName"] if city else "",
+            },
+            request,
+        )
+        for start in range(0, len(areas), settings.SAFETY_AREAS_PER_CHUNK):
+            yield render_to_string(
+                "safety_areas.html",
+                {"areas": areas[start : start + settings.SAFETY_AREAS_PER_CHUNK]},
+                request,
+            )
+        yield render_to_string("safety_end.html", {}, request)
+
+    deadline = current_deadline()
+    return add_page_headers(
+        StreamingHttpResponse(deadline.stream(stream_safety())),
+        "safety",
+        etag,
+        last_modified,
     )
 
 
+def destinations_mode(request):
+    return "one-stop" if request.GET.get("mode") == "one-stop" else "direct"
+
+
+@with_deadline("destinations")
 async def destinations(request):
-    home_city = await sync_to_async(get_home_city)(request)
+    home_city = await get_home_city(request)
     if not home_city:
         return render(
             request,
             "no_home_saved.html",
         )
-    async with httpx.AsyncClient() as client:
-        try:
-            token_type, access_token = await access_token_and_type(client)
-            tasks = []
-            for iata in home_city["airports"]:
-                tasks.append(
-                    asyncio.ensure_future(
-                        get_destination_cities_for_airport(
-                            client, token_type, access_token, iata
-                        )
-                    )
-                )
+    mode = destinations_mode(request)
+    etag = last_modified = None
+    version = await destination_routes_version(home_city, stops=mode == "one-stop")
+    if version is not None:
+        last_modified = version["refreshed_at"]
+        etag = make_etag(
+            "destinations",
+            mode,
+            home_city["iata"],
+            sorted(home_city["airports"]),
+            version["routes"],
+            last_modified,
+        )
+    response = conditional_response(request, "destinations", etag, last_modified)
+    if response is not None:
+        return response
 
-            destinations_for_home_airports = await asyncio.gather(*tasks)
-            cities = []
-            added_cities = {home_city["iata"]}
-            for airport_destinations in destinations_for_home_airports:
-                for city in airport_destinations:
-                    if city["iataCode"] not in added_cities:
-                        added_cities.add(city["iataCode"])
-                        cities.append(city)
+    async def stream_destinations():
+        yield render_to_string("destinations_start.html", {"mode": mode}, request)
+        countries = []
+        try:
+            if mode == "one-stop":
+                countries = await get_one_stop_destination_countries(home_city)
+            else:
+                countries = await get_direct_destination_countries(home_city)
         except httpx.RequestError as exc:
             logging.error(f"An error occurred while requesting {exc.request.url}.")
         except httpx.HTTPStatusError as exc:
             logging.error(
                 f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
             )
-        cities_by_country = {}
-        for city in cities:
-            country = city["address"]["countryName"]
-            if country not in cities_by_country:
-                cities_by_country[country] = [city]
-            else:
-                cities_by_country[country].append(city)
-        cities_by_country = {
-            country: {
-                "cities": sorted(
-                    cities,
-                    key=lambda destination_city: destination_city["name"],
-                ),
-                "index": index,
-            }
-            for index, (country, cities) in enumerate(sorted(cities_by_country.items()))
-        }
-        for country, _ in cities_by_country.items():
+        except asyncio.TimeoutError:
             pass
-        return render(
+        yield render_to_string(
+            "destinations_countries.html",
+            {"countries": countries, "mode": mode},
             request,
-            "destinations.html",
-            {"countries": cities_by_country},
         )
+        yield render_to_string(
+            "partial_results.html", {"partial": deadline.partial}, request
+        )
+        yield render_to_string("page_end.html", {}, request)
+
+    deadline = current_deadline()
+    return add_page_headers(
+        StreamingHttpResponse(deadline.stream(stream_destinations())),
+        "destinations",
+        etag,
+        last_modified,
+    )
 
 
+@with_deadline("destinations_country")
+async def destinations_country(request):
+    home_city = await get_home_city(request)
+    if not home_city:
+        return HttpResponseNotFound()
+    mode = destinations_mode(request)
+    country_code = request.GET.get("country_code", "").upper()
+    key = f"destinations_fragment:{mode}:{home_city['iata']}:{country_code}"
+    fragment = await cache.aget(key)
+    if fragment is not None:
+        return HttpResponse(fragment)
+    cities = None
+    try:
+        if mode == "one-stop":
+            cities = await get_one_stop_destination_cities(home_city, country_code)
+        else:
+            cities = await get_direct_destination_cities(home_city, country_code)
+    except httpx.RequestError as exc:
+        logging.error(f"An error occurred while requesting {exc.request.url}.")
+    except httpx.HTTPStatusError as exc:
+        logging.error(
+            f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+        )
+    except asyncio.TimeoutError:
+        pass
+    partial = current_deadline().partial or cities is None
+    fragment = render_to_string(
+        "destinations_cities.html",
+        {"cities": cities or [], "partial": partial},
+        request,
+    )
+    if not partial:
+        await cache.aset(key, fragment, settings.DESTINATIONS_FRAGMENT_TTL)
+    return HttpResponse(fragment)
+
+
+@with_deadline("home")
 async def home(request):
-    home_city = await sync_to_async(get_home_city)(request)
+    home_city = await get_home_city(request)
     form = HomeSearchForm()
     if request.method == "POST":
         form = HomeSearchForm(request.POST)
         if form.is_valid():
-            async with httpx.AsyncClient() as client:
-                try:
-                    token_type, access_token = await access_token_and_type(client)
-                    response = await client.get(
-                        f"https://{os.environ.get('AMADEUS_BASE_URL')}/v1/reference-data/locations",
-                        params={
-                            "subType": "CITY",
-                            "keyword": form.cleaned_data["city"],
-                        },
-                        headers={"Authorization": f"{token_type} {access_token}"},
-                    )
-                    response.raise_for_status()
-                    cities = [
-                        (
-                            f"{city['address']['cityName']},{city['iataCode']},{city['address']['countryCode']},"
-                            f"{city['geoCode']['latitude']},{city['geoCode']['longitude']},"
-                            f"{city['address']['countryName']}",
-                            f"{city['address']['cityName']}, {city['address']['countryName']}",
-                        )
-                        for city in response.json().get("data", [])
-                        if city["iataCode"] != home_city.get("iata")
-                    ]
-                except httpx.RequestError as exc:
-                    logging.error(
-                        f"An error occurred while requesting {exc.request.url}."
-                    )
-                except httpx.HTTPStatusError as exc:
-                    logging.error(
-                        f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
-                    )
+            try:
+                cities = await search_cities(form.cleaned_data["city"])
+                cities = [
+                    home_city_choice(city)
+                    for city in cities
+                    if city["iataCode"] != home_city.get("iata")
+                ]
+            except httpx.RequestError as exc:
+                logging.error(f"An error occurred while requesting {exc.request.url}.")
+            except httpx.HTTPStatusError as exc:
+                logging.error(
+                    f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+                )
+            except asyncio.TimeoutError:
+                cities = []
             results_form = HomeResultsForm(choices=cities) if cities else None
             return render(
                 request,
@@ -454,6 +701,7 @@ async def home(request):
                     "form": form,
                     "results_form": results_form,
                     "home_city": home_city,
+                    "partial": current_deadline().partial,
                 },
             )
     return render(
@@ -464,3 +712,96 @@ async def home(request):
             "home_city": home_city,
         },
     )
+
+
+async def city_suggestions(request):
+    city_index = await get_city_index()
+    return JsonResponse(
+        {
+            "results": [
+                {"value": value, "label": label}
+                for value, label in suggest_cities(city_index, request.GET.get("q", ""))
+            ]
+        }
+    )
+
+
+@with_deadline("cheapest_everywhere")
+async def cheapest_everywhere(request):
+    home_city = await get_home_city(request)
+    if not home_city:
+        return render(
+            request,
+            "no_home_saved.html",
+        )
+    travel_preferences = await get_travel_preferences(request)
+    form = TravelPreferencesForm(initial=travel_preferences)
+    if request.method == "POST":
+        form = TravelPreferencesForm(request.POST)
+        travel_preferences = form.cleaned_data if form.is_valid() else {}
+        if travel_preferences:
+            await save_travel_preferences(request, travel_preferences)
+    cities = []
+    if travel_preferences:
+        try:
+            cities = await get_direct_destination_cities(home_city)
+        except httpx.RequestError as exc:
+            logging.error(f"An error occurred while requesting {exc.request.url}.")
+        except httpx.HTTPStatusError as exc:
+            logging.error(
+                f"Error response {exc.response.status_code} while requesting {exc.request.url}: {exc.response.text}"
+            )
+        except asyncio.TimeoutError:
+            pass
+    get_token(request)
+
+    async def stream_cheapest_flights():
+        yield render_to_string(
+            "cheapest_everywhere_start.html",
+            {"form": form, "home_city": home_city, "destination_count": len(cities)},
+            request,
+        )
+        if cities:
+            async for flight in sweep_cheapest_flights(
+                home_city["iata"],
+                cities,
+                travel_preferences["nonstop_only"],
+                travel_preferences["trip_length"],
+            ):
+                yield render_to_string(
+                    "cheapest_everywhere_row.html", {"flight": flight}, request
+                )
+        yield render_to_string(
+            "cheapest_everywhere_end.html", {"partial": deadline.partial}, request
+        )
+
+    deadline = current_deadline()
+    return StreamingHttpResponse(deadline.stream(stream_cheapest_flights()))
+
+
+async def metrics(request):
+    response_cache = Counter(
+        "varyfly_response_cache_lookups_total",
+        "Cached Amadeus lookups by result.",
+        ("result",),
+    )
+    for result, count in response_cache_stats.items():
+        response_cache.inc((result,), count)
+    coalescing = Counter(
+        "varyfly_coalesced_requests_total",
+        "Amadeus calls sent and identical calls absorbed by them.",
+        ("outcome",),
+    )
+    for outcome, count in coalescing_stats.items():
+        coalescing.inc((outcome,), count)
+    database_pool = Gauge(
+        "varyfly_database_pool",
+        "Database connection pool statistics.",
+        ("stat",),
+    )
+    for stat, value in pool_stats().items():
+        database_pool.set((stat,), value)
+    return HttpResponse(
+        prometheus_text(response_cache, coalescing, database_pool),
+        content_type="text/plain; version=0.0.4",
+    )